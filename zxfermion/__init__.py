@@ -1,5 +1,7 @@
 from .gates import Gadget
 from .tableaus.tableau import Tableau
+from .tableaus.pauli_table import PauliTable
 from .graphs.base_graph import BaseGraph
 from .graphs.gadget_graph import GadgetGraph
+from .graphs.layout_graph import LayoutGraph
 from .circuits.circuits import GadgetCircuit, CircuitCollection
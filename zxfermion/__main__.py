@@ -0,0 +1,5 @@
+import sys
+
+from zxfermion.cli import main
+
+sys.exit(main())
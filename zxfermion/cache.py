@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from zxfermion.utils import Settings, settings
+
+TEMPORARY_PREFIX = '.tmp-'
+RENDER_FILES = [Path('tikz/template.tex'), Path('tikz/styles.tikzstyles')]
+
+
+def settings_values() -> dict:
+    """Values of the settings that change how artefacts are rendered, which are all but the cache settings."""
+    return {name: getattr(settings, name) for name in vars(Settings)
+            if not name.startswith('_') and not name.startswith('cache')}
+
+
+def file_hashes() -> dict[str, Optional[str]]:
+    return {str(path): hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else None
+            for path in RENDER_FILES}
+
+
+def write_atomic(path: str | Path, write, mode: str = 'w'):
+    """Calls write with a file that replaces path once written, so an interrupted write never leaves half a file."""
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(mode, dir=path.parent, prefix=TEMPORARY_PREFIX, suffix=path.suffix,
+                                     delete=False) as file:
+        try:
+            write(file)
+        except BaseException:
+            file.close()
+            os.remove(file.name)
+            raise
+    os.replace(file.name, path)
+
+
+def copy_atomic(source: str | Path, target: str | Path):
+    with open(source, 'rb') as source_file:
+        write_atomic(target, lambda file: shutil.copyfileobj(source_file, file), 'wb')
+
+
+class ArtefactCache:
+    """Directory of rendered artefacts, each named by a hash of everything it was rendered from.
+
+    Files are written under a temporary name and renamed into place, so processes sharing a directory only ever see
+    whole artefacts. Reading an artefact marks it as recently used, and once the directory holds more than
+    `max_bytes` the least recently used artefacts are deleted."""
+    def __init__(self, directory: str | Path, max_bytes: int = settings.cache_max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls) -> Optional[ArtefactCache]:
+        if settings.cache_directory is None:
+            return None
+        return cls(settings.cache_directory, settings.cache_max_bytes)
+
+    @staticmethod
+    def key(circuit, suffix: str, **options) -> str:
+        """Hash of a circuit, as serialised by `to_dict` along with how each gate is drawn, the kind of artefact, the
+        render options, the settings and the LaTeX template and styles."""
+        content = {
+            'circuit': circuit.to_dict(),
+            'drawing': [(gate.as_gadget, gate.stack, getattr(gate, 'var', None)) for gate in circuit.gates],
+            'suffix': suffix,
+            'options': options,
+            'settings': settings_values(),
+            'files': file_hashes()}
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.directory / f'{key}{suffix}'
+
+    def fetch(self, key: str, suffix: str, target: str | Path) -> bool:
+        """Copies a cached artefact to target, returning False if there is none."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            copy_atomic(path, target)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def load(self, key: str, suffix: str) -> Optional[str]:
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+            return path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def store(self, key: str, suffix: str, source: str | Path):
+        """Copies a rendered file into the cache."""
+        copy_atomic(source, self.path(key, suffix))
+        self.evict()
+
+    def save(self, key: str, suffix: str, text: str):
+        write_atomic(self.path(key, suffix), lambda file: file.write(text))
+        self.evict()
+
+    def entries(self) -> list[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.startswith(TEMPORARY_PREFIX)]
+
+    def size(self) -> int:
+        total = 0
+        for entry in self.entries():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self):
+        """Deletes the least recently used artefacts until the cache fits in max_bytes."""
+        entries = []
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in self.entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
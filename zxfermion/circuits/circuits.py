@@ -1,70 +1,371 @@
 from __future__ import annotations
 
+import math
+from collections import defaultdict
+
+import numpy as np
 import pyzx as zx
-from typing import Optional
+import stim
+from pathlib import Path
+from typing import Callable, Iterator, Optional
 from copy import deepcopy, copy
+from functools import wraps
 
 from zxfermion import Gadget, BaseGraph
+from zxfermion.cache import ArtefactCache
+from zxfermion.circuits.statevector import simulate
+from zxfermion.exceptions import IncompatibleGatesException
+from zxfermion import gates as gate_classes
+from zxfermion.gates import Identity
+from zxfermion.graphs.builder import GraphBuilder, LayoutBuilder
 from zxfermion.graphs.gadget_graph import GadgetGraph
-from zxfermion.tableaus.tableau import Tableau
+from zxfermion.graphs.layout_graph import LayoutGraph
+from zxfermion.tableaus.tableau import Tableau, NAMED_GATES, named_tableau
+from zxfermion.tableaus.pauli_table import PauliTable
 from zxfermion.types import GateType
 from zxfermion.utils import settings
 
 
+def counted(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class GateList(list):
+    """List of gates that counts the changes made to it, so that graphs of the gates can be kept until it changes."""
+    def __init__(self, gates=(), version: int = 0):
+        super().__init__(gates)
+        self.version = version
+
+    __setitem__ = counted(list.__setitem__)
+    __delitem__ = counted(list.__delitem__)
+    __iadd__ = counted(list.__iadd__)
+    __imul__ = counted(list.__imul__)
+    append = counted(list.append)
+    extend = counted(list.extend)
+    insert = counted(list.insert)
+    pop = counted(list.pop)
+    remove = counted(list.remove)
+    clear = counted(list.clear)
+    sort = counted(list.sort)
+    reverse = counted(list.reverse)
+
+
 class GadgetCircuit:
     def __init__(self, gates: list[Gadget], num_qubits: Optional[int] = 0):
         self.type = GateType.GADGET_CIRCUIT
-        self.gates = deepcopy(gates)
+        self.gate_list = GateList(deepcopy(gates))
         self.num_qubits = max(num_qubits, max([
             max(gate.paulis) + 1
             if gate.type == GateType.GADGET
             else max(gate.qubits) + 1
             for gate in self.gates]))
+        self.builder: Optional[GraphBuilder] = None  # keeps the graph drawn by apply in step with the gates
+        self.builder_version = None
+        self.graphs = {}  # (as_gadgets, stack, compact) -> graph built at graphs_version
+        self.graphs_version = None
+
+    def __getstate__(self):
+        return {**self.__dict__, 'builder': None, 'builder_version': None, 'graphs': {}, 'graphs_version': None}
+
+    @property
+    def gates(self) -> GateList:
+        return self.gate_list
+
+    @gates.setter
+    def gates(self, gates: list):
+        self.gate_list = GateList(gates, version=self.gate_list.version + 1)
+
+    @property
+    def version(self) -> int:
+        """Number of changes made to the gates of the circuit. Changes made to the gates themselves are not counted."""
+        return self.gate_list.version
 
     def __add__(self, other: GadgetCircuit) -> GadgetCircuit:
         assert self.num_qubits == other.num_qubits
         return GadgetCircuit(gates=self.simplify(self.gates + other.gates))
 
     def apply(self, gate, start: int = 0, end: int = None, draw=False):
-        assert max(gate.qubits) < self.num_qubits  # update num qubits instead / think about edge cases
+        if isinstance(gate, list):
+            cliffords = gate
+        else:
+            cliffords = gate.gates if gate.type == GateType.GADGET_CIRCUIT else [gate]
+        if not cliffords:
+            return
+        qubits = [qubit for clifford in cliffords for qubit in clifford.qubits]
+        assert max(qubits) < self.num_qubits  # update num qubits instead / think about edge cases
         end = len(self.gates) if end is None else end
-        tableau = Tableau(gate)
-        new_gadgets = [
-            tableau(gadget)
-            if gadget.type == GateType.GADGET else gadget
-            for gadget in self.gates[start:end]]
-        self.gates[start:end] = [copy(gate), *new_gadgets, copy(gate.inverse)]
+        synced = self.builder is not None and self.builder_version == self.version
+        gates = self.gates[start:end]
+        indices = [index for index, gadget in enumerate(gates) if gadget.type == GateType.GADGET]
+        if indices:
+            tableau = Tableau(cliffords[0]) if len(cliffords) == 1 else Tableau.from_gates(cliffords)
+            table = PauliTable.from_gadgets([gates[index] for index in indices], num_qubits=self.num_qubits)
+            for index, gadget in zip(indices, table.conjugate(tableau).to_gadgets()):
+                gates[index] = gadget
+        self.gates[start:end] = [
+            *[copy(clifford) for clifford in reversed(cliffords)],
+            *gates,
+            *[copy(clifford.inverse) for clifford in cliffords]]
+        if synced:
+            self.builder.replace(start, end, self.gates[start:start + len(gates) + 2 * len(cliffords)])
+            self.builder_version = self.version
         if draw:
-            zx.draw(self.graph())
+            zx.draw(self.cached_graph() if settings.stack else self.persistent_graph())
         # self.gates[start:end] = new_gadgets
 
-    def graph(self, as_gadgets: bool = None, stack: bool = settings.stack) -> GadgetGraph:
-        graph = GadgetGraph(num_qubits=self.num_qubits)
+    def peephole(self, gates: Optional[list] = None, max_passes: int = 3) -> list:
+        """Fuses adjacent gates acting on the same qubits and cancels inverse pairs."""
+        gates = self.gates if gates is None else gates
+        for _ in range(max_passes):
+            gates, changed = peephole_pass(gates)
+            if not changed:
+                break
+        return gates
+
+    def schedule(self, disjoint: bool = False) -> tuple[GadgetCircuit, list[int]]:
+        """Groups gadgets into layers of mutually commuting (and, if disjoint, non-overlapping) gadgets.
+
+        Each gadget is placed greedily in the earliest layer after every earlier gadget it anticommutes with, so
+        the reordered circuit implements the same unitary. Returns the reordered circuit and the layer boundaries,
+        such that layer k is gates[boundaries[k]:boundaries[k + 1]].
+        """
+        table = self.to_table()
+        anticommuting = ~table.commutation_matrix()
+        occupied = []  # qubit support of each layer as a bit mask
+        layers = np.zeros(len(table), dtype=np.int64)
+        for index, gadget in enumerate(self.gates):
+            earlier = layers[:index][anticommuting[index, :index]]
+            layer = int(earlier.max()) + 1 if earlier.size else 0
+            support = gadget.x | gadget.z
+            while disjoint and layer < len(occupied) and occupied[layer] & support:
+                layer += 1
+            if layer == len(occupied):
+                occupied.append(0)
+            occupied[layer] |= support
+            layers[index] = layer
+        order = np.argsort(layers, kind='stable')
+        boundaries = np.searchsorted(layers[order], np.arange(len(occupied) + 1)).tolist()
+        return GadgetCircuit([self.gates[index] for index in order], num_qubits=self.num_qubits), boundaries
+
+    def extract_cliffords(self) -> tuple[list[Gadget], Tableau]:
+        """Pushes every Clifford gate to the end of the circuit, returning the rewritten gadgets and the Clifford."""
+        frame = stim.Tableau(self.num_qubits)  # inverse of the Cliffords swept so far
+        tableau = None
+        gadgets = []
         for gate in self.gates:
-            gate.as_gadget = gate.as_gadget if as_gadgets is None else as_gadgets
-            graph.compose(gate.graph, stack=gate.stack if stack is None else stack)
-        return graph
+            if gate.type in NAMED_GATES:
+                frame.prepend(named_tableau(gate.type).inverse(), list(gate.qubits))
+                tableau = None
+            else:
+                if tableau is None:
+                    tableau = Tableau(frame.copy(), qubits=list(range(self.num_qubits)), lookup=False)
+                if gate.type == GateType.X_PHASE:
+                    gate = Gadget.from_bits(1 << gate.qubit, 0, gate.phase, var=gate.var, stack=gate.stack)
+                elif gate.type == GateType.Z_PHASE:
+                    gate = Gadget.from_bits(0, 1 << gate.qubit, gate.phase, var=gate.var, stack=gate.stack)
+                gadgets.append(tableau(gate))
+        return gadgets, Tableau(frame.inverse(), qubits=list(range(self.num_qubits)), lookup=False)
+
+    def graph(self, as_gadgets: bool = None, stack: bool = settings.stack, compact: bool = False) -> GadgetGraph:
+        return self.build(GraphBuilder(num_qubits=self.num_qubits, stack=stack), as_gadgets, compact)
+
+    def layout_graph(self, as_gadgets: bool = None, stack: bool = settings.stack, compact: bool = False) -> LayoutGraph:
+        """Same layout as graph, held in NumPy arrays and built without pyzx."""
+        return self.build(LayoutBuilder(num_qubits=self.num_qubits, stack=stack), as_gadgets, compact)
+
+    def pages(
+            self,
+            gates_per_page: Optional[int] = None,
+            rows_per_page: Optional[int] = None,
+            as_gadgets: bool = None,
+            stack: bool = settings.stack) -> Iterator[LayoutGraph]:
+        """Lays out the circuit one page at a time, each page holding at most gates_per_page gates and taking at most
+        rows_per_page rows. Every page starts and ends with the wires of the whole register, so the wires continue
+        from one page onto the next. A gate wider than rows_per_page is put on a page of its own."""
+        assert gates_per_page or rows_per_page
+        builder, count = None, 0
+        for gate in self.gates:
+            if builder is not None and (
+                    count == gates_per_page
+                    or (rows_per_page and builder.width_with(gate, as_gadget=as_gadgets) > rows_per_page)):
+                yield builder.build()
+                builder = None
+            if builder is None:
+                builder, count = LayoutBuilder(num_qubits=self.num_qubits, stack=stack), 0
+            builder.add(gate, as_gadget=as_gadgets)
+            count += 1
+        yield (LayoutBuilder(num_qubits=self.num_qubits, stack=stack) if builder is None else builder).build()
+
+    def export_pages(
+            self,
+            name: str,
+            format: str = 'tikz',
+            gates_per_page: Optional[int] = None,
+            rows_per_page: Optional[int] = None,
+            scale: Optional[float] = None,
+            **kwargs) -> list[Path]:
+        """Writes each page of the circuit to output/{name}_{page}.{format} as soon as it is laid out."""
+        from zxfermion.graphs.svg import write_svg
+        from zxfermion.graphs.tikz import write_tikz
+        assert format in ['tikz', 'svg']
+        write, default_scale = (write_tikz, settings.tikz_scale) if format == 'tikz' else (write_svg, settings.svg_scale)
+        Path('output/').mkdir(parents=True, exist_ok=True)
+        paths = []
+        for number, page in enumerate(self.pages(gates_per_page, rows_per_page, **kwargs)):
+            paths.append(Path(f'output/{name}_{number:03d}.{format}'))
+            with open(paths[-1], 'w') as file:
+                write(page, file, scale=default_scale if scale is None else scale)
+        return paths
+
+    def build(self, builder: GraphBuilder, as_gadgets: bool = None, compact: bool = False):
+        if compact:
+            builder.add_compacted(self.gates, as_gadget=as_gadgets)
+        else:
+            for gate in self.gates:
+                builder.add(gate, as_gadget=as_gadgets)
+        return builder.build()
+
+    def persistent_graph(self) -> GadgetGraph:
+        """Unstacked graph of the circuit, which apply patches in place instead of laying out every gate again."""
+        if self.builder is None or self.builder_version != self.version:
+            self.builder = GraphBuilder(num_qubits=self.num_qubits, stack=False)
+            for gate in self.gates:
+                self.builder.add(gate)
+            self.builder.build()
+            self.builder_version = self.version
+        return self.builder.graph
+
+    def cached_graph(self, as_gadgets: bool = None, stack: bool = settings.stack, compact: bool = False) -> GadgetGraph:
+        """Graph of the circuit, built once for every version of the circuit and shared by the exporting methods."""
+        if self.graphs_version != (self.version, self.num_qubits):
+            self.graphs = {}
+            self.graphs_version = (self.version, self.num_qubits)
+        key = (as_gadgets, stack, compact)
+        if key not in self.graphs:
+            self.graphs[key] = self.graph(as_gadgets=as_gadgets, stack=stack, compact=compact)
+        return self.graphs[key]
 
     def simplify(self, gates: Optional[list] = None) -> list:
-        """Needs work. Use __add__ methods to do this"""
-        # return [key for key, group in groupby(gates if gates else self.gates) if len(list(group)) % 2]
-        return gates if gates else self.gates
+        """Merges gadgets with equal Pauli strings when every gate between them commutes with both. The merged gadget
+        keeps the var, as_gadget and stack of the first.
+
+        The gates between two gadgets with the same Pauli string are checked in one vectorised call on a PauliTable of
+        the circuit, starting from where the previous check of that string stopped. A gate is therefore compared with
+        each Pauli string at most once, and a circuit of n gates with k distinct Pauli strings takes O(nk) word
+        operations in NumPy."""
+        gates = self.gates if gates is None else gates
+        if not gates:
+            return []
+        is_gadget = [gate.type == GateType.GADGET for gate in gates]
+        num_qubits = max([max(gate.qubits) + 1 for gate, gadget in zip(gates, is_gadget) if not gadget], default=1)
+        identity = Gadget.from_bits(0, 0)
+        # merged gadgets have their rows cleared, so the table only holds the gates still in place
+        table = PauliTable.from_gadgets(
+            [gate if gadget else identity for gate, gadget in zip(gates, is_gadget)], num_qubits)
+        # other gates block any gadget they share a qubit with
+        blockers = PauliTable.from_gadgets([
+            identity if gadget else Gadget.from_bits(sum(1 << qubit for qubit in gate.qubits), 0)
+            for gate, gadget in zip(gates, is_gadget)], table.num_qubits).x
+        num_blockers = np.cumsum([0] + [not gadget for gadget in is_gadget])
+        kept, positions = [], []  # merged away gadgets are replaced with None; positions in gates of the kept gates
+        last_index = {}  # (x, z) -> (index in kept of the last gadget with those bits, position checked up to)
+
+        def blocked(position: int, start: int) -> bool:
+            if num_blockers[position] > num_blockers[start]:
+                support = table.x[position] | table.z[position]
+                if (blockers[start:position] & support).any():
+                    return True
+            return not table.commutes_with_row(position, start, position).all()
+
+        for position, gate in enumerate(gates):
+            if is_gadget[position]:
+                key = (gate.x, gate.z)
+                index, checked = last_index.get(key, (None, None))
+                if index is not None and not blocked(position, checked):
+                    first = kept[index]
+                    phase = first.phase + gate.phase
+                    table.x[position] = table.z[position] = 0
+                    if math.isclose(phase % 2, 0, abs_tol=1e-12) or math.isclose(phase % 2, 2):
+                        kept[index] = None
+                        table.x[positions[index]] = table.z[positions[index]] = 0
+                        del last_index[key]
+                    else:
+                        kept[index] = Gadget.from_bits(
+                            first.x, first.z, phase, var=first.var, as_gadget=first.as_gadget, stack=first.stack)
+                        last_index[key] = (index, position + 1)
+                    continue
+                last_index[key] = (len(kept), position + 1)
+            kept.append(gate)
+            positions.append(position)
+        return [gate for gate in kept if gate is not None]
+
+    def statevector(self, initial_state=None, dtype=np.complex128) -> np.ndarray:
+        """State after applying the circuit to initial_state, |0...0> by default, with qubit 0 as the most significant
+        bit. Gadgets and named gates act directly on the 2^n amplitudes, so no 2^n x 2^n matrix is built."""
+        return simulate(self.gates, self.num_qubits, initial_state, dtype)
 
     def matrix(self, return_latex=False, override_max=False):
-        return self.graph().matrix(return_latex=return_latex, override_max=override_max)
+        return self.cached_graph().matrix(return_latex=return_latex, override_max=override_max)
 
     def draw(self, as_gadgets: bool = None, stack: bool = settings.stack, labels: bool = False):
-        zx.draw(self.graph(as_gadgets=as_gadgets, stack=stack), labels=labels)
+        zx.draw(self.cached_graph(as_gadgets=as_gadgets, stack=stack), labels=labels)
+
+    def cached_export(self, suffix: str, path: Optional[str], render: Callable, **options):
+        """Runs render, which writes the artefact to path or returns its text if path is None, unless the artefact is
+        in the cache of settings.cache_directory."""
+        cache = ArtefactCache.from_settings()
+        if cache is None:
+            return render()
+        key = cache.key(self, suffix, **options)
+        if path is None:
+            text = cache.load(key, suffix)
+            if text is None:
+                text = render()
+                cache.save(key, suffix, text)
+            return text
+        if not cache.fetch(key, suffix, path):
+            render()
+            cache.store(key, suffix, path)
 
     def tikz(self, name: Optional[str] = None, scale: float = settings.tikz_scale, **kwargs):
-        return self.graph(**kwargs).tikz(name=name, scale=scale)
+        return self.cached_export(
+            '.tikz', None if name is None else f'output/{name}.tikz',
+            lambda: self.cached_graph(**kwargs).tikz(name=name, scale=scale), scale=scale, **kwargs)
+
+    def tex(self, name: str, scale: float = settings.tikz_scale, **kwargs):
+        self.cached_export(
+            '.tex', f'output/{name}_temp.tex',
+            lambda: self.cached_graph(**kwargs).tex(name=name, scale=scale), scale=scale, **kwargs)
 
-    def pdf(self, name: str, scale: float = settings.tikz_scale, **kwargs):
-        return self.graph(**kwargs).pdf(name=name, scale=scale)
+    def pdf(self, name: str, scale: float = settings.tikz_scale, engine: str = settings.latex_engine, **kwargs):
+        self.cached_export(
+            '.pdf', f'output/{name}.pdf',
+            lambda: self.cached_graph(**kwargs).pdf(name=name, scale=scale, engine=engine),
+            scale=scale, engine=engine, **kwargs)
+
+    def svg(self, name: Optional[str] = None, scale: float = settings.svg_scale, **kwargs):
+        return self.cached_export(
+            '.svg', None if name is None else f'output/{name}.svg',
+            lambda: self.cached_graph(**kwargs).svg(name=name, scale=scale), scale=scale, **kwargs)
+
+    def html(self, name: str, **kwargs):
+        self.cached_export(
+            '.html', f'output/{name}_temp.html', lambda: self.cached_graph(**kwargs).html(name=name), **kwargs)
 
     def clipboard(self):
-        graph = self.graph()
-        graph.clipboard()
+        self.cached_graph().clipboard()
+
+    def to_table(self) -> PauliTable:
+        assert all(gate.type == GateType.GADGET for gate in self.gates)
+        return PauliTable.from_gadgets(self.gates, num_qubits=self.num_qubits)
+
+    @classmethod
+    def from_table(cls, table: PauliTable) -> GadgetCircuit:
+        return cls(gates=table.to_gadgets(), num_qubits=table.num_qubits)
 
     def to_dict(self) -> list[dict[str, str | int | float]]:
         return {
@@ -78,10 +379,56 @@ class GadgetCircuit:
         for gate in circuit_dict['gates']:
             name = next(iter(gate))
             assert name in GateType.NAMES
-            gates.append(eval(name)(**gate[name]))
+            gates.append(getattr(gate_classes, name)(**gate[name]))
         return cls(gates=gates, num_qubits=circuit_dict.get('num_qubits'))
 
 
+def fuse_gates(left, right):
+    if left.type in [GateType.CX, GateType.CZ]:
+        return Identity() if left == right else None
+    elif right.type in [GateType.CX, GateType.CZ]:
+        return None
+    if left.type == GateType.GADGET and right.type == GateType.GADGET:
+        if (left.x, left.z) != (right.x, right.z):
+            return None
+        # Gadget.__add__ would drop how the first gadget is drawn
+        fused = Gadget.from_bits(
+            left.x, left.z, left.phase + right.phase, var=left.var, as_gadget=left.as_gadget, stack=left.stack)
+    else:
+        try:
+            fused = left + right
+        except IncompatibleGatesException:
+            return None
+    if fused.type == GateType.GADGET and (math.isclose(fused.phase, 0, abs_tol=1e-12) or math.isclose(fused.phase, 2)):
+        return Identity()
+    return Identity() if getattr(fused, 'identity', False) else fused
+
+
+def peephole_pass(gates: list) -> tuple[list, bool]:
+    kept = []  # cancelled gates are replaced with None
+    stacks = defaultdict(list)  # qubit -> indices in kept of the gates acting on it
+    changed = False
+    for gate in gates:
+        qubits = set(gate.qubits)
+        tops = {stacks[qubit][-1] if stacks[qubit] else None for qubit in qubits}
+        top = tops.pop() if len(tops) == 1 else None
+        if top is not None and set(kept[top].qubits) == qubits:
+            fused = fuse_gates(kept[top], gate)
+            if fused is not None:
+                changed = True
+                if fused.type == GateType.IDENTITY:
+                    kept[top] = None
+                    for qubit in qubits:
+                        stacks[qubit].pop()
+                else:
+                    kept[top] = fused
+                continue
+        for qubit in qubits:
+            stacks[qubit].append(len(kept))
+        kept.append(gate)
+    return [gate for gate in kept if gate is not None], changed
+
+
 class CircuitCollection:
     def __init__(self, circuit1: GadgetCircuit, circuit2: GadgetCircuit):
         self.circuit1 = deepcopy(circuit1)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import math
+import numpy as np
+
+from zxfermion.gates.gates import Gadget
+from zxfermion.types import GateType
+
+Z_GATES = [GateType.Z_PHASE, GateType.Z, GateType.Z_PLUS, GateType.Z_MINUS]
+X_GATES = [GateType.X_PHASE, GateType.X, GateType.X_PLUS, GateType.X_MINUS]
+
+
+def axis(state: np.ndarray, qubit: int, value: int) -> tuple:
+    """Index of the half of a state, viewed as a tensor with one axis per qubit, in which qubit has value."""
+    index = [slice(None)] * state.ndim
+    index[qubit] = value
+    return tuple(index)
+
+
+def qubits_of(bits: int) -> list[int]:
+    return [qubit for qubit in range(bits.bit_length()) if bits >> qubit & 1]
+
+
+def parity_signs(state: np.ndarray, qubits: list[int]) -> np.ndarray:
+    """(-1) to the parity of the given qubits, shaped to broadcast against the state."""
+    signs = np.ones([2 if qubit in qubits else 1 for qubit in range(state.ndim)], dtype=np.int8)
+    for qubit in qubits:
+        signs[axis(signs, qubit, 1)] *= -1
+    return signs
+
+
+def apply_gadget(state: np.ndarray, gadget: Gadget):
+    """Applies exp(-i pi phase/2 P) for the Pauli string P of a gadget to a state tensor, in place.
+
+    With Y = iXZ, P|b> = i^|x & z| (-1)^parity((b ^ x) & z) |b ^ x>, which is (-i)^|x & z| (-1)^parity(c & z) |c>
+    for c = b ^ x. P is applied by flipping the axes of the X qubits and multiplying by the signs of the Z qubits."""
+    angle = math.pi * gadget.phase / 2
+    signs = parity_signs(state, qubits_of(gadget.z))
+    if not gadget.x:
+        state *= np.where(signs > 0, np.exp(-1j * angle), np.exp(1j * angle)).astype(state.dtype)
+        return
+    coefficient = -1j * math.sin(angle) * (-1j) ** bin(gadget.x & gadget.z).count('1')
+    flipped = np.flip(state, axis=qubits_of(gadget.x)) * (signs * coefficient).astype(state.dtype)
+    state *= math.cos(angle)
+    state += flipped
+
+
+def apply_single(state: np.ndarray, qubit: int, matrix: np.ndarray):
+    zero, one = axis(state, qubit, 0), axis(state, qubit, 1)
+    new_zero = matrix[0, 0] * state[zero] + matrix[0, 1] * state[one]
+    state[one] = matrix[1, 0] * state[zero] + matrix[1, 1] * state[one]
+    state[zero] = new_zero
+
+
+def apply_gate(state: np.ndarray, gate):
+    """Applies a gate to a state tensor, in place. Phases of single qubit gates follow the ZX calculus: ZPhase(a) is
+    diag(1, e^(i pi a)) and XPhase(a) is H ZPhase(a) H."""
+    if gate.type == GateType.GADGET:
+        apply_gadget(state, gate)
+    elif gate.type in Z_GATES:
+        state[axis(state, gate.qubit, 1)] *= np.exp(1j * math.pi * gate.phase)
+    elif gate.type in X_GATES:
+        rotation = np.exp(1j * math.pi * gate.phase)
+        apply_single(state, gate.qubit, np.array([[1 + rotation, 1 - rotation], [1 - rotation, 1 + rotation]]) / 2)
+    elif gate.type == GateType.H:
+        apply_single(state, gate.qubit, np.array([[1, 1], [1, -1]]) / math.sqrt(2))
+    elif gate.type == GateType.CX:
+        controlled = state[axis(state, gate.control, 1)]
+        target = gate.target - (gate.target > gate.control)
+        zero, one = axis(controlled, target, 0), axis(controlled, target, 1)
+        swapped = controlled[zero].copy()
+        controlled[zero] = controlled[one]
+        controlled[one] = swapped
+    elif gate.type == GateType.CZ:
+        controlled = state[axis(state, gate.control, 1)]
+        controlled[axis(controlled, gate.target - (gate.target > gate.control), 1)] *= -1
+    elif gate.type != GateType.IDENTITY:
+        raise NotImplementedError(f'cannot simulate {gate}')
+
+
+def initial_statevector(num_qubits: int, initial_state=None, dtype=np.complex128) -> np.ndarray:
+    """A copy of initial_state as a vector of 2^num_qubits amplitudes, with qubit 0 as the most significant bit.
+
+    initial_state may be a vector, a basis state given as an int or as a string of bits for qubits 0, 1, ..., or
+    None for |0...0>."""
+    if initial_state is None or isinstance(initial_state, (int, str)):
+        index = int(initial_state, 2) if isinstance(initial_state, str) else initial_state or 0
+        assert 0 <= index < 2 ** num_qubits
+        state = np.zeros(2 ** num_qubits, dtype=dtype)
+        state[index] = 1
+        return state
+    state = np.array(initial_state, dtype=dtype)
+    assert state.shape == (2 ** num_qubits,)
+    return state
+
+
+def simulate(gates: list, num_qubits: int, initial_state=None, dtype=np.complex128) -> np.ndarray:
+    """Final state of a circuit, updated gate by gate in a single array of 2^num_qubits amplitudes."""
+    state = initial_statevector(num_qubits, initial_state, dtype)
+    tensor = state.reshape([2] * num_qubits)
+    for gate in gates:
+        apply_gate(tensor, gate)
+    return state
@@ -0,0 +1,194 @@
+"""Renders circuits, serialised with `GadgetCircuit.to_dict()`, in parallel.
+
+    python -m zxfermion circuits.jsonl --format svg --output figures
+    python -m zxfermion circuits/ --format tikz --processes 8
+    python -m zxfermion --operators --format tex
+
+Each circuit is written to `{output}/{name}.{format}`, and a record of its timing or failure is appended to
+`{output}/manifest.jsonl`. A run that is stopped and started again skips the circuits the manifest records as
+rendered with the same payload, options and settings, unless --force is given. Lines that are not valid JSON and
+circuits named with a path rather than a file name are recorded as failed."""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+import traceback
+from itertools import chain
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator, Optional
+
+from zxfermion.cache import settings_values, write_atomic
+from zxfermion.utils import settings
+
+FORMATS = {'tikz': '.tikz', 'svg': '.svg', 'tex': '.tex'}
+MANIFEST = 'manifest.jsonl'
+
+
+def payload_hash(payload: dict, format: str, scale: float, stack: bool) -> str:
+    """Hash of a circuit together with everything its file depends on: the format, scale and stack options and the
+    settings."""
+    content = {'payload': payload, 'format': format, 'scale': scale, 'stack': stack, 'settings': settings_values()}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def read_json(text: str, name: str) -> tuple[str, dict | Exception]:
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as exception:
+        return name, exception
+    if not isinstance(payload, dict):
+        return name, ValueError(f'expected a JSON object, not {type(payload).__name__}')
+    return payload.pop('name', name), payload
+
+
+def read_jsonl(path: Path) -> Iterator[tuple[str, dict | Exception]]:
+    with open(path) as file:
+        for number, line in enumerate(file):
+            if line.strip():
+                yield read_json(line, f'{path.stem}_{number:04d}')
+
+
+def read_circuits(source: Path) -> Iterator[tuple[str, dict | Exception]]:
+    """Names and payloads of the circuits in a JSON Lines file, or in the .json and .jsonl files of a directory.
+
+    A payload may carry its own name under 'name'. Otherwise circuits are named after their file, and line number
+    in a JSON Lines file. A circuit that is not valid JSON is given with its exception in place of a payload."""
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.suffix == '.json':
+                yield read_json(path.read_text(), path.stem)
+            elif path.suffix == '.jsonl':
+                yield from read_jsonl(path)
+    else:
+        yield from read_jsonl(source)
+
+
+def read_operators() -> Iterator[tuple[str, dict]]:
+    from zxfermion.other.operators import operators
+    for number, operator in enumerate(operators):
+        yield f'operator_{number:03d}', operator.to_dict()
+
+
+def describe(exception: Exception) -> str:
+    return ''.join(traceback.format_exception_only(type(exception), exception)).strip()
+
+
+def check_name(name) -> Optional[str]:
+    """Why a circuit name cannot be used as a file name in the output directory, if it cannot."""
+    if not isinstance(name, str) or not name:
+        return f'invalid name {name!r}'
+    if '/' in name or '\\' in name or '..' in name:
+        return f'invalid name {name!r}: names may not contain /, \\ or ..'
+    return None
+
+
+def render(job: tuple[str, dict, str, str, Path, float, bool]) -> dict:
+    """Renders one circuit and returns its manifest record. Runs in a worker process."""
+    from zxfermion.circuits.circuits import GadgetCircuit
+    from zxfermion.graphs.latex import template_parts
+    from zxfermion.graphs.svg import write_svg
+    from zxfermion.graphs.tikz import write_tikz
+    name, payload, hash, format, output, scale, stack = job
+    record = {'name': name, 'format': format, 'hash': hash}
+    start = time.perf_counter()
+    try:
+        graph = GadgetCircuit.from_dict(payload).layout_graph(stack=stack)
+        if format == 'tikz':
+            write = lambda file: write_tikz(graph, file, scale=scale)
+        elif format == 'svg':
+            write = lambda file: write_svg(graph, file, scale=scale)
+        else:
+            head, tail = template_parts()
+
+            def write(file):
+                file.write(head)
+                write_tikz(graph, file, scale=scale, strip=True)
+                file.write(tail)
+        write_atomic(output / f'{name}{FORMATS[format]}', write)
+        record['status'] = 'ok'
+    except Exception as exception:
+        record['status'] = 'failed'
+        record['error'] = describe(exception)
+    record['seconds'] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def rendered(output: Path, format: str) -> set[tuple[str, str]]:
+    """Names and hashes the manifest records as rendered to format and that are still on disk."""
+    done = set()
+    manifest = output / MANIFEST
+    if manifest.exists():
+        with open(manifest) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # line cut short by an interrupted run
+                    continue
+                if record.get('status') == 'ok' and record.get('format') == format:
+                    done.add((record['name'], record['hash']))
+    return {(name, hash) for name, hash in done if (output / f'{name}{FORMATS[format]}').exists()}
+
+
+def export(
+        circuits: Iterator[tuple[str, dict]],
+        output: Path,
+        format: str = 'tikz',
+        processes: Optional[int] = None,
+        scale: Optional[float] = None,
+        stack: bool = settings.stack,
+        force: bool = False,
+        log=sys.stdout) -> list[dict]:
+    """Renders circuits with a pool of processes and returns the manifest records of this run."""
+    output.mkdir(parents=True, exist_ok=True)
+    scale = (settings.svg_scale if format == 'svg' else settings.tikz_scale) if scale is None else scale
+    done = set() if force else rendered(output, format)
+    jobs, failures, skipped = [], [], 0
+    for name, payload in circuits:
+        error = describe(payload) if isinstance(payload, Exception) else check_name(name)
+        if error is not None:
+            failures.append({'name': str(name), 'format': format, 'status': 'failed', 'error': error, 'seconds': 0.0})
+            continue
+        hash = payload_hash(payload, format, scale, stack)
+        if (name, hash) in done:
+            skipped += 1
+        else:
+            jobs.append((name, payload, hash, format, output, scale, stack))
+    records = []
+    with Pool(processes) as pool, open(output / MANIFEST, 'a') as manifest:
+        for record in chain(failures, pool.imap_unordered(render, jobs)):
+            manifest.write(json.dumps(record) + '\n')
+            manifest.flush()
+            records.append(record)
+            if record['status'] == 'ok':
+                print(f"{record['name']}: {record['seconds']:.3f}s", file=log)
+            else:
+                print(f"{record['name']}: FAILED {record['error']}", file=log)
+    failed = sum(record['status'] != 'ok' for record in records)
+    print(f'{len(records) - failed} rendered, {failed} failed, {skipped} skipped', file=log)
+    return records
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m zxfermion', description=__doc__.split('\n')[0])
+    parser.add_argument('source', nargs='?', type=Path, help='JSON Lines file or directory of circuits')
+    parser.add_argument('--operators', action='store_true', help='render the circuits of zxfermion.other.operators')
+    parser.add_argument('--format', choices=FORMATS, default='tikz')
+    parser.add_argument('--output', type=Path, default=Path('output'))
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, one per CPU by default')
+    parser.add_argument('--scale', type=float, default=None)
+    parser.add_argument('--stack', action='store_true', help='stack gates acting on different qubits')
+    parser.add_argument('--force', action='store_true', help='render circuits the manifest records as rendered')
+    options = parser.parse_args(args)
+    if (options.source is None) == (not options.operators):
+        parser.error('give either a source or --operators')
+    if options.source is not None and not options.source.exists():
+        parser.error(f'{options.source} does not exist')
+    circuits = read_operators() if options.operators else read_circuits(options.source)
+    records = export(
+        circuits, options.output, format=options.format, processes=options.processes, scale=options.scale,
+        stack=options.stack, force=options.force)
+    return int(any(record['status'] != 'ok' for record in records))
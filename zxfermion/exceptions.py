@@ -1,2 +1,6 @@
 class IncompatibleGatesException(Exception):
     pass
+
+
+class LatexException(Exception):
+    pass
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import math
-import re
 from copy import deepcopy
 from typing import Optional, Union
 
@@ -14,8 +13,25 @@ from zxfermion.exceptions import IncompatibleGatesException
 Phase = Optional[Union[int, float]]
 PhaseVar = Optional[str]
 
+PAULI_CHARS = frozenset('IXYZ')
+X_BITS = str.maketrans('IXYZ', '0110')
+Z_BITS = str.maketrans('IXYZ', '0011')
+BITS_PAULI = {(0, 0): PauliType.I, (1, 0): PauliType.X, (1, 1): PauliType.Y, (0, 1): PauliType.Z}
+
+
+def pauli_bits(pauli_string: str) -> tuple[int, int]:
+    if not PAULI_CHARS.issuperset(pauli_string):
+        raise ValueError(f"'{pauli_string}' is not a valid Pauli string")
+    reversed_string = pauli_string[::-1]
+    return int(reversed_string.translate(X_BITS) or '0', 2), int(reversed_string.translate(Z_BITS) or '0', 2)
+
+
+def parity(bits: int) -> int:
+    return bin(bits).count('1') % 2
+
 
 class BaseGate:
+    __slots__ = ()
     var: Optional[str]
     as_gadget: Optional[bool]
     stack: Optional[bool] = False
@@ -43,14 +59,13 @@ class CliffordGate(FixedPhaseGate):
 
 
 class Gadget(BaseGate):
+    __slots__ = ('type', 'x', 'z', 'phase', 'var', 'as_gadget', 'stack')
+
     def __init__(self, pauli_string: str, phase: Phase = None, var: PhaseVar = None, as_gadget=True, stack=None):
-        pauli_string = re.sub(r'^I+|I+$', lambda match: '_' * len(match.group()), pauli_string)
         self.type = GateType.GADGET
+        self.x, self.z = pauli_bits(pauli_string)
         self.phase = 0 if phase is None else round(phase % 2, 15)
-        self.paulis = {q: PauliType(p) for q, p in enumerate(pauli_string) if p != '_'}
-        self.phase_gadget = all(pauli == PauliType.Z or pauli == PauliType.I for pauli in self.paulis.values())
-        self.identity = self.phase_gadget and math.isclose(self.phase, 0)
-        self.stack = stack if stack else self.stack
+        self.stack = stack if stack else BaseGate.stack
         self.as_gadget = as_gadget
         self.var = rf'\{var}' if (var is not None and var != '') else None
 
@@ -61,21 +76,50 @@ class Gadget(BaseGate):
         if self.identity and other.type == GateType.IDENTITY:
             return True
         elif other.type == GateType.GADGET:
-            return self.paulis == other.paulis and math.isclose(self.phase, other.phase)
+            return self.x == other.x and self.z == other.z and math.isclose(self.phase, other.phase)
         else:
             return False
 
     def __add__(self, other):
         if other.type == GateType.IDENTITY:
             return self
-        elif other.type == GateType.GADGET and self.paulis == other.paulis:
-            return Gadget(self.pauli_string, self.phase + other.phase)
+        elif other.type == GateType.GADGET and self.x == other.x and self.z == other.z:
+            return Gadget.from_bits(self.x, self.z, self.phase + other.phase)
         else:
             raise IncompatibleGatesException
 
+    @property
+    def paulis(self) -> dict[int, PauliType]:
+        support = self.x | self.z
+        lowest = (support & -support).bit_length() - 1
+        return {qubit: self.pauli(qubit) for qubit in range(max(lowest, 0), support.bit_length())}
+
     @property
     def pauli_string(self) -> str:
-        return ''.join(self.paulis.get(pauli, 'I') for pauli in range(max(self.paulis) + 1))
+        return ''.join(self.pauli(qubit) for qubit in range((self.x | self.z).bit_length()))
+
+    @property
+    def qubits(self) -> list[int]:
+        support, qubits = self.x | self.z, []
+        while support:
+            lowest = support & -support
+            qubits.append(lowest.bit_length() - 1)
+            support ^= lowest
+        return qubits
+
+    @property
+    def phase_gadget(self) -> bool:
+        return not self.x
+
+    @property
+    def identity(self) -> bool:
+        return self.phase_gadget and math.isclose(self.phase, 0)
+
+    def pauli(self, qubit: int) -> PauliType:
+        return BITS_PAULI[(self.x >> qubit & 1, self.z >> qubit & 1)]
+
+    def commutes(self, other: Gadget) -> bool:
+        return not parity((self.x & other.z) ^ (self.z & other.x))
 
     @property
     def inverse(self) -> Gadget:
@@ -87,11 +131,24 @@ class Gadget(BaseGate):
     def graph(self):
         from zxfermion.graphs.gadget_graph import GadgetGraph
         graph = GadgetGraph(max(self.paulis) + 1)
-        graph.add_gadget(self, self.var) if self.as_gadget else graph.add_expanded_gadget(self, self.var)
-        graph.set_left_padding(1.5)
-        graph.set_right_padding(1.5)
+        with graph.deferred_layout():
+            graph.add_gadget(self) if self.as_gadget else graph.add_expanded_gadget(self)
+            graph.set_left_padding(1.5)
+            graph.set_right_padding(1.5)
         return graph
 
+    @classmethod
+    def from_bits(cls, x: int, z: int, phase: Phase = None, var: PhaseVar = None, as_gadget=True, stack=None) -> Gadget:
+        """Builds a gadget from its symplectic bits. Unlike the constructor, var is stored as given."""
+        gadget = cls.__new__(cls)
+        gadget.type = GateType.GADGET
+        gadget.x, gadget.z = x, z
+        gadget.phase = 0 if phase is None else round(phase % 2, 15)
+        gadget.stack = stack if stack else BaseGate.stack
+        gadget.as_gadget = as_gadget
+        gadget.var = var
+        return gadget
+
     @classmethod
     def from_gate(cls, gate: SingleQubitGate) -> Gadget:
         return cls(pauli_string='I' * gate.qubit + 'Z', phase=gate.phase, var=gate.var, stack=gate.stack)
@@ -158,6 +215,9 @@ class ControlledGate(BaseGate, SelfInverse):
     def __eq__(self, other):
         return (self.control, self.target) == (other.control, other.target) if self.type == other.type else False
 
+    def to_dict(self) -> dict:
+        return {self.__class__.__name__: {'control': self.control, 'target': self.target}}
+
 
 class XPhase(SingleQubitGate):
     def __init__(self, qubit: Optional[int] = None, phase: Phase = None, var: PhaseVar = None, **kwargs):
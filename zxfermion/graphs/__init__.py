@@ -1,3 +1,6 @@
 from .base_graph import BaseGraph
 from .gadget_graph import GadgetGraph
-from .tikz import to_tikz
+from .latex import compile_pdfs, compile_pictures, export_pdfs
+from .layout_graph import LayoutGraph
+from .svg import to_svg, write_svg
+from .tikz import to_tikz, write_tikz
@@ -1,24 +1,41 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import subprocess
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
 from copy import deepcopy
+from fractions import Fraction
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pyzx as zx
 from IPython.core.display import Markdown
 from IPython.core.display_functions import display
-# from pdflatex import PDFLaTeX
 from pyzx.graph.graph_s import GraphS
+from pyzx.utils import EdgeType
 
 from zxfermion.utils import pair_list, settings
 
-#### PDFLATEX STUFF MAKE IT LIGHTER
-
 
 class BaseGraph(GraphS):
     def __init__(self, num_qubits: Optional[int] = 1, num_rows: Optional[int] = 1, boundary_padding: Optional[int] = 1):
+        # non-boundary vertices on each qubit, kept sorted by their (row, vertex) keys in index_keys
+        self.qubit_index: dict[int | float, list[int]] = {}
+        self.index_keys: dict[int | float, list[tuple]] = {}
+        # sorted qubits of qubit_index, and (row, qubit) of the first and last vertex on each, for the extrema
+        self.indexed_qubits: list[int | float] = []
+        self.first_rows: list[tuple] = []
+        self.last_rows: list[tuple] = []
+        self.boundary_set: set[int] = set()
+        self.indexing = True
+        self.deferred = 0  # depth of nested deferred_layout blocks
+        self.pending_padding: dict[str, Optional[int | float]] = {}
+        # bumped by every mutator below; code calling the GraphS setters directly bumps it itself
+        self.mutations = 0
+        self.cached_fingerprint: Optional[tuple[int, int]] = None  # (mutations, fingerprint)
         super().__init__()
         self.num_qubits = num_qubits
         self.boundary_padding = boundary_padding
@@ -27,23 +44,210 @@ class BaseGraph(GraphS):
         self.add_edges([(self.inputs()[qubit], self.outputs()[qubit]) for qubit in range(self.num_qubits)])
 
     def __eq__(self, other):
-        # ADD VDATA
-        other_data = other.rows(), other.qubits(), other.types()
-        self_data = self.rows(), self.qubits(), self.types()
-        return self_data == other_data
+        return isinstance(other, BaseGraph) and self.fingerprint() == other.fingerprint()
+
+    def __hash__(self):
+        # a graph modified after being added to a set or used as a dict key is lost from it, as with any mutable key
+        return hash(self.fingerprint())
+
+    def vertex_key(self, vertex: int) -> str:
+        data = sorted((key, canonical(self.vdata(vertex, key))) for key in self.vdata_keys(vertex))
+        return repr((
+            canonical(self.qubit(vertex)), canonical(self.row(vertex)),
+            int(self.type(vertex)), canonical(self.phase(vertex)), data))
+
+    def fingerprint(self) -> int:
+        """Hash of the diagram that does not depend on how its vertices are numbered.
+
+        Covers the position, type, phase and vdata of every vertex and the endpoints and type of every edge. Vertex
+        and edge hashes are summed, so the fingerprint is found in one pass without sorting and is the same in every
+        Python process. It is cached until the graph is next modified."""
+        if self.cached_fingerprint is not None and self.cached_fingerprint[0] == self.mutations:
+            return self.cached_fingerprint[1]
+        vertices = list(self.vertices())
+        hashes = np.array([
+            int.from_bytes(hashlib.blake2b(self.vertex_key(vertex).encode(), digest_size=8).digest(), 'little')
+            for vertex in vertices], dtype=np.uint64)
+        index = {vertex: position for position, vertex in enumerate(vertices)}
+        edges = np.array([
+            (index[source], index[target], int(self.graph[source][target])) for source, target in self.edges()
+        ], dtype=np.uint64).reshape(-1, 3)
+        sources, targets = hashes[edges[:, 0].astype(np.intp)], hashes[edges[:, 1].astype(np.intp)]
+        edge_hashes = mix(mix(np.minimum(sources, targets) ^ edges[:, 2]) ^ np.maximum(sources, targets))
+        vertex_sum, edge_sum = int(mix(hashes).sum(dtype=np.uint64)), int(edge_hashes.sum(dtype=np.uint64))
+        fingerprint = (len(vertices) << 192) | (len(edges) << 128) | (vertex_sum << 64) | edge_sum
+        self.cached_fingerprint = (self.mutations, fingerprint)
+        return fingerprint
 
     def __add__(self, other):
         new = deepcopy(self)
         new.compose(other, stack=False)
         return new
 
+    def __iadd__(self, other):
+        self.compose(other, stack=False)
+        return self
+
+    def index_key(self, vertex: int) -> tuple:
+        return self.row(vertex), vertex
+
+    def index_vertex(self, vertex: int):
+        if not self.indexing or vertex in self.boundary_set:
+            return
+        qubit, key = self.qubit(vertex), self.index_key(vertex)
+        vertices, keys = self.qubit_index.setdefault(qubit, []), self.index_keys.setdefault(qubit, [])
+        ends = self.index_ends(qubit)
+        if not keys or keys[-1] < key:
+            vertices.append(vertex)
+            keys.append(key)
+        else:
+            index = bisect_left(keys, key)
+            vertices.insert(index, vertex)
+            keys.insert(index, key)
+        self.update_ends(qubit, ends)
+
+    def unindex_vertex(self, vertex: int):
+        qubit = self.qubit(vertex)
+        keys = self.index_keys.get(qubit)
+        if not self.indexing or vertex in self.boundary_set or not keys:
+            return
+        ends = self.index_ends(qubit)
+        index = len(keys) - 1 if self.qubit_index[qubit][-1] == vertex else bisect_left(keys, self.index_key(vertex))
+        if index < len(keys) and keys[index][1] == vertex:
+            del self.qubit_index[qubit][index], keys[index]
+            if not keys:
+                del self.qubit_index[qubit], self.index_keys[qubit]
+            self.update_ends(qubit, ends)
+
+    def index_ends(self, qubit) -> Optional[tuple]:
+        keys = self.index_keys.get(qubit)
+        return (keys[0][0], keys[-1][0]) if keys else None
+
+    def update_ends(self, qubit, ends: Optional[tuple]):
+        """Moves the entries of a qubit in indexed_qubits, first_rows and last_rows, given its ends before a change."""
+        new_ends = self.index_ends(qubit)
+        if new_ends == ends:
+            return
+        if ends is None:
+            insort(self.indexed_qubits, qubit)
+        else:
+            remove_sorted(self.first_rows, (ends[0], qubit))
+            remove_sorted(self.last_rows, (ends[1], qubit))
+        if new_ends is None:
+            remove_sorted(self.indexed_qubits, qubit)
+        else:
+            insort(self.first_rows, (new_ends[0], qubit))
+            insort(self.last_rows, (new_ends[1], qubit))
+
+    def bounded(self, qubit) -> bool:
+        return 0 <= qubit <= self.num_qubits - 1
+
+    def bounded_index(self) -> dict[int | float, list[int]]:
+        return {
+            qubit: vertices
+            for qubit, vertices
+            in self.qubit_index.items()
+            if 0 <= qubit <= self.num_qubits - 1
+        }
+
+    def add_vertex(self, *args, **kwargs) -> int:
+        # index the vertex once it is placed, rather than after each of its setters
+        self.indexing = False
+        try:
+            vertex = super().add_vertex(*args, **kwargs)
+        finally:
+            self.indexing = True
+        self.index_vertex(vertex)
+        return vertex
+
+    def add_vertices(self, amount):
+        self.mutations += 1
+        vertices = super().add_vertices(amount)
+        for vertex in vertices:
+            self.index_vertex(vertex)
+        return vertices
+
+    def add_vertex_indexed(self, vertex):
+        self.mutations += 1
+        super().add_vertex_indexed(vertex)
+        self.index_vertex(vertex)
+
+    def remove_vertices(self, vertices):
+        self.mutations += 1
+        for vertex in vertices:
+            self.unindex_vertex(vertex)
+        super().remove_vertices(vertices)
+        self.boundary_set.difference_update(vertices)
+
+    def add_edges(self, edges, edgetype=EdgeType.SIMPLE, smart=False):
+        self.mutations += 1
+        super().add_edges(edges, edgetype, smart)
+
+    def remove_edges(self, edges):
+        self.mutations += 1
+        super().remove_edges(edges)
+
+    def set_edge_type(self, edge, edge_type):
+        self.mutations += 1
+        super().set_edge_type(edge, edge_type)
+
+    def set_type(self, vertex, vertex_type):
+        self.mutations += 1
+        super().set_type(vertex, vertex_type)
+
+    def set_phase(self, vertex, phase):
+        self.mutations += 1
+        super().set_phase(vertex, phase)
+
+    def add_to_phase(self, vertex, phase):
+        self.mutations += 1
+        super().add_to_phase(vertex, phase)
+
+    def set_vdata(self, vertex, key, val):
+        self.mutations += 1
+        super().set_vdata(vertex, key, val)
+
+    def set_qubit(self, vertex, qubit):
+        self.mutations += 1
+        self.unindex_vertex(vertex)
+        super().set_qubit(vertex, qubit)
+        self.index_vertex(vertex)
+
+    def set_row(self, vertex, row):
+        self.mutations += 1
+        self.unindex_vertex(vertex)
+        super().set_row(vertex, row)
+        self.index_vertex(vertex)
+
+    def set_inputs(self, inputs):
+        super().set_inputs(inputs)
+        self.update_boundary_set()
+
+    def set_outputs(self, outputs):
+        super().set_outputs(outputs)
+        self.update_boundary_set()
+
+    def update_boundary_set(self):
+        boundary_set = set(self.inputs()) | set(self.outputs())
+        for vertex in self.boundary_set - boundary_set:
+            self.boundary_set.discard(vertex)
+            if vertex in self.graph:
+                self.index_vertex(vertex)
+        for vertex in boundary_set - self.boundary_set:
+            self.unindex_vertex(vertex)
+            self.boundary_set.add(vertex)
+
     @property
     def min_qubit(self) -> int:
-        return min((self.qubit(vertex) for vertex in self.bounded_vertices), default=0)
+        index = bisect_left(self.indexed_qubits, 0)
+        qubits = self.indexed_qubits[index:index + 1]
+        return qubits[0] if qubits and self.bounded(qubits[0]) else 0
 
     @property
     def max_qubit(self) -> int:
-        return max((self.qubit(vertex) for vertex in self.bounded_vertices), default=self.num_qubits - 1)
+        index = bisect_right(self.indexed_qubits, self.num_qubits - 1)
+        qubits = self.indexed_qubits[index - 1:index] if index else []
+        return qubits[0] if qubits and self.bounded(qubits[0]) else self.num_qubits - 1
 
     @property
     def input_row(self) -> int:
@@ -55,11 +259,12 @@ class BaseGraph(GraphS):
 
     @property
     def left_row(self) -> int:
-        return min((self.row(vertex) for vertex in self.bounded_vertices), default=self.output_row)
+        # vertices off the wires are rare, so the first bounded qubit is found within a few steps
+        return next((row for row, qubit in self.first_rows if self.bounded(qubit)), self.output_row)
 
     @property
     def right_row(self) -> int:
-        return max((self.row(vertex) for vertex in self.bounded_vertices), default=self.input_row)
+        return next((row for row, qubit in reversed(self.last_rows) if self.bounded(qubit)), self.input_row)
 
     @property
     def left_padding(self) -> int:
@@ -83,11 +288,13 @@ class BaseGraph(GraphS):
 
     def left_end(self, qubit: int) -> int:
         default = self.outputs()[qubit] if qubit < self.num_qubits else None
-        return self.vertices_on_qubit(qubit)[0] if self.vertices_on_qubit(qubit) else default
+        vertices = self.qubit_index.get(qubit) if 0 <= qubit < self.num_qubits else None
+        return vertices[0] if vertices else default
 
     def right_end(self, qubit: int) -> int:
         default = self.inputs()[qubit] if qubit < self.num_qubits else None
-        return self.vertices_on_qubit(qubit)[-1] if self.vertices_on_qubit(qubit) else default
+        vertices = self.qubit_index.get(qubit) if 0 <= qubit < self.num_qubits else None
+        return vertices[-1] if vertices else default
 
     def left_row_within(self, top: int, bottom: int) -> int:
         return min(self.row(self.left_end(q)) for q in range(top, bottom + 1))
@@ -101,7 +308,7 @@ class BaseGraph(GraphS):
             vertex
             for vertex
             in self.vertices()
-            if vertex not in self.boundaries
+            if vertex not in self.boundary_set
             and 0 <= self.qubit(vertex) <= self.num_qubits - 1
         ]
 
@@ -111,17 +318,12 @@ class BaseGraph(GraphS):
             vertex
             for vertex
             in self.vertices()
-            if vertex not in self.boundaries
-            and vertex not in self.bounded_vertices
+            if vertex not in self.boundary_set
+            and not 0 <= self.qubit(vertex) <= self.num_qubits - 1
         ]
 
     def vertices_on_qubit(self, qubit: int) -> list[int]:
-        return sorted([
-            vertex
-            for vertex
-            in self.bounded_vertices
-            if self.qubit(vertex) == qubit
-        ], key=lambda vertex: self.row(vertex))
+        return list(self.qubit_index.get(qubit, [])) if 0 <= qubit <= self.num_qubits - 1 else []
 
     def remove_wire(self, qubit: int):
         self.remove_edge((self.inputs()[qubit], self.outputs()[qubit]))
@@ -137,19 +339,60 @@ class BaseGraph(GraphS):
         for vertex in self.outputs():
             self.set_row(vertex, row)
 
+    @contextmanager
+    def deferred_layout(self):
+        """Suspends padding updates inside the block and applies the last requested paddings once on exit.
+
+        Only the padding is deferred, including the padding done by compose and set_num_qubits, so the input and
+        output rows stay where they are until the block exits. Rows are not renumbered: a vertex placed inside the
+        block at an explicit row, or after the input of an empty wire, is positioned against the unpadded graph. The
+        result matches the one outside the block whenever the paddings requested inside it would not have moved any
+        row, as for expanded gadgets and `Gadget.graph`."""
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                pending, self.pending_padding = self.pending_padding, {}
+                if 'left' in pending:
+                    self.set_left_padding(pending['left'])
+                if 'right' in pending:
+                    self.set_right_padding(pending['right'])
+
     def set_left_padding(self, padding: Optional[int] = None):
+        if self.deferred:
+            self.pending_padding['left'] = padding
+            return
         padding = self.boundary_padding if padding is None else padding
         offset = self.input_row - self.left_row + padding
-        for vertex in [vertex for vertex in self.vertices() if vertex not in self.inputs()]:
-            self.set_row(vertex, self.row(vertex) + offset)
+        # only a zero int offset leaves the rows as they are, since adding 0.0 or Fraction(0) changes their type
+        if offset or type(offset) is not int:
+            self.shift_rows(offset)
+
+    def shift_rows(self, offset: int | float):
+        """Moves every vertex except the inputs right by the given offset."""
+        inputs = set(self.inputs())
+        self.mutations += 1
+        for vertex in [vertex for vertex in self.vertices() if vertex not in inputs]:
+            GraphS.set_row(self, vertex, self.row(vertex) + offset)
+        # a uniform shift keeps every qubit's vertices in order, so only the rows in the index change
+        for keys in self.index_keys.values():
+            keys[:] = [(row + offset, vertex) for row, vertex in keys]
+        self.first_rows = [(row + offset, qubit) for row, qubit in self.first_rows]
+        self.last_rows = [(row + offset, qubit) for row, qubit in self.last_rows]
 
     def set_right_padding(self, padding: Optional[int] = None):
+        if self.deferred:
+            self.pending_padding['right'] = padding
+            return
         padding = self.boundary_padding if padding is None else padding
         self.set_output_row(self.right_row + padding)
 
     def set_num_qubits(self, num_qubits: int):
         assert num_qubits >= self.num_qubits
         graph = BaseGraph(num_qubits=num_qubits)
+        graph.deferred, graph.pending_padding = self.deferred, self.pending_padding
         graph.compose(self)
         self.__dict__.update(graph.__dict__)
 
@@ -157,25 +400,36 @@ class BaseGraph(GraphS):
         if num_qubits > self.num_qubits:
             self.set_num_qubits(num_qubits)
 
-    def compose(self, other: BaseGraph, stack: bool = False):
-        other = deepcopy(other)
+    def compose(self, other: BaseGraph, stack: bool = False, consume: bool = False):
+        """Appends other to the graph. Other is only read, unless consume is set, in which case its vertices are moved
+        into the graph, numbered as in other shifted past the vertices of the graph, and other is left as an empty
+        graph."""
+        if other is self:
+            assert not consume
+            other = deepcopy(other)
         out_refs = [self.right_end(qubit) for qubit in range(self.num_qubits)]
         self.update_num_qubits(max(self.num_qubits, other.num_qubits))
 
         row = self.right_row_within(other.min_qubit, other.max_qubit) if stack else self.right_row
-        vertex_dict = {
-            vertex: self.add_vertex(
-                other.type(vertex),
-                phase=other.phase(vertex),
-                qubit=other.qubit(vertex),
-                row=other.row(vertex) + row)
-            for vertex in other.vertices()
-            if vertex not in other.boundaries
-        }
+        if consume:
+            offset = max(self.vertices()) + 1
+            vertex_dict = {vertex: vertex + offset for vertex in other.vertices() if vertex not in other.boundary_set}
+            for vertex, new_vertex in vertex_dict.items():
+                self.move_vertex(other, vertex, new_vertex, row)
+        else:
+            vertex_dict = {
+                vertex: self.add_vertex(
+                    other.type(vertex),
+                    phase=other.phase(vertex),
+                    qubit=other.qubit(vertex),
+                    row=other.row(vertex) + row)
+                for vertex in other.vertices()
+                if vertex not in other.boundary_set
+            }
 
         for edge in other.edges():
             source, target = other.edge_st(edge)
-            if source not in other.boundaries and target not in other.boundaries:
+            if source not in other.boundary_set and target not in other.boundary_set:
                 self.add_edge(self.edge(
                     vertex_dict[source],
                     vertex_dict[target]
@@ -194,9 +448,24 @@ class BaseGraph(GraphS):
             vertical_offset = self.num_qubits - other.num_qubits
             self.set_qubit(vertex_dict[vertex], other.qubit(vertex) + vertical_offset)
 
+        if consume:
+            BaseGraph.__init__(other, num_qubits=other.num_qubits, boundary_padding=other.boundary_padding)
         self.set_left_padding()
         self.set_right_padding()
 
+    def move_vertex(self, other: BaseGraph, vertex: int, new_vertex: int, row: int | float):
+        """Adds a vertex of other to the graph as new_vertex, offset by row, and indexes it once it is placed."""
+        self.indexing = False
+        try:
+            self.add_vertex_indexed(new_vertex)
+            self.set_type(new_vertex, other.type(vertex))
+            self.set_phase(new_vertex, other.phase(vertex))
+            self.set_qubit(new_vertex, other.qubit(vertex))
+            self.set_row(new_vertex, other.row(vertex) + row)
+        finally:
+            self.indexing = True
+        self.index_vertex(new_vertex)
+
     def matrix(self, return_latex=False, override_max=False):
         if self.num_qubits < 5 or override_max:
             latex_string = zx.matrix_to_latex(self.to_matrix())
@@ -206,31 +475,41 @@ class BaseGraph(GraphS):
             print(f'{2 ** self.num_qubits} x {2 ** self.num_qubits} matrix too large to compute.')
 
     def tikz(self, name: Optional[str] = None, scale: float = settings.tikz_scale):
-        from zxfermion.graphs import to_tikz
-        Path('output/').mkdir(parents=True, exist_ok=True)
-        tikz_content = to_tikz(self, scale=scale)
+        from zxfermion.graphs.tikz import to_tikz, write_tikz
         if name is not None:
+            Path('output/').mkdir(parents=True, exist_ok=True)
             with open(f'output/{name}.tikz', 'w') as file:
-                file.write(tikz_content)
+                write_tikz(self, file, scale=scale)
         else:
-            return tikz_content
+            return to_tikz(self, scale=scale)
 
     def tex(self, name: str, scale: float = settings.tikz_scale):
+        from zxfermion.graphs.latex import template_parts
+        from zxfermion.graphs.tikz import write_tikz
         Path('output/').mkdir(parents=True, exist_ok=True)
-        tikz_content = self.tikz(scale=scale)
-        with open('tikz/template.tex', 'r') as template_file:
-            tex_output = template_file.read().replace('TIKZ_PICTURE', tikz_content.strip())
+        head, tail = template_parts()
         with open(f'output/{name}_temp.tex', 'w') as file:
-            file.write(tex_output)
+            file.write(head)
+            write_tikz(self, file, scale=scale, strip=True)
+            file.write(tail)
 
-    def pdf(self, name: str, scale: float = settings.tikz_scale):
+    def pdf(self, name: str, scale: float = settings.tikz_scale, engine: str = settings.latex_engine):
+        from zxfermion.graphs.latex import compile_pdfs
         self.tex(name=name, scale=scale)
-        #pdf = PDFLaTeX.from_texfile(f'output/{name}_temp.tex')
-        #pdf.set_pdf_filename(f'{name}')
-        #pdf.set_output_directory('output/')
-        #pdf.create_pdf(keep_pdf_file=True, keep_log_file=False)
-        #if os.path.exists(f'output/{name}_temp.tex'):
-        #    os.remove(f'output/{name}_temp.tex')
+        try:
+            compile_pdfs([f'output/{name}_temp.tex'], outputs=[f'output/{name}.pdf'], engine=engine)
+        finally:
+            if os.path.exists(f'output/{name}_temp.tex'):
+                os.remove(f'output/{name}_temp.tex')
+
+    def svg(self, name: Optional[str] = None, scale: float = settings.svg_scale):
+        from zxfermion.graphs.svg import to_svg, write_svg
+        if name is not None:
+            Path('output/').mkdir(parents=True, exist_ok=True)
+            with open(f'output/{name}.svg', 'w') as file:
+                write_svg(self, file, scale=scale)
+        else:
+            return to_svg(self, scale=scale)
 
     def clipboard(self):
         subprocess.run('pbcopy', text=True, input=self.tikz())
@@ -241,3 +520,22 @@ class BaseGraph(GraphS):
     def html(self, name: str):
         with open(f'output/{name}_temp.html', 'w') as file:
             file.write(zx.draw(self))
+
+
+def canonical(value) -> str:
+    """Text of a number that is the same for equal ints, floats and fractions."""
+    try:
+        return str(Fraction(value))
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    """Splitmix64 finaliser, applied elementwise to an array of uint64."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def remove_sorted(items: list, item):
+    del items[bisect_left(items, item)]
@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+from array import array
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from pyzx import VertexType, EdgeType
+from pyzx.graph.graph_s import GraphS
+
+from zxfermion.gates.gates import Gadget, XPlus, XMinus, H, CX, CZ
+from zxfermion.graphs.gadget_graph import GadgetGraph
+from zxfermion.graphs.layout_graph import LayoutGraph, phase_fraction
+from zxfermion.tableaus.pauli_table import PauliTable
+from zxfermion.types import PauliType, GateType
+
+TEMPLATE_CACHE_SIZE = 1024
+NUM_LANES = 3  # hub and phase lanes below the register
+
+
+class Layout:
+    """Vertices and internal edges of a single gate, positioned as in the graph of the gate on its own."""
+    def __init__(self, num_qubits: int):
+        self.num_qubits = num_qubits
+        self.vertices = []  # (type, phase, qubit, row, var)
+        self.edges = []
+        self.ends = {}  # qubit -> last vertex added on the qubit
+        self.phase_vertex = None  # vertex carrying the phase of the gate
+
+    def add_vertex(self, ty, qubit, row, phase=None, var=None) -> int:
+        self.vertices.append((ty, vertex_phase(ty, phase), qubit, row, var))
+        return len(self.vertices) - 1
+
+    def add_edge(self, source: int, target: int):
+        self.edges.append((source, target))
+
+    def extend_wire(self, qubit: int, vertex: int):
+        if qubit in self.ends:
+            self.add_edge(self.ends[qubit], vertex)
+        self.ends[qubit] = vertex
+
+    def bounded(self, vertex: int) -> bool:
+        return 0 <= self.vertices[vertex][2] <= self.num_qubits - 1
+
+    def row(self, vertex: int):
+        return self.vertices[vertex][3]
+
+    @property
+    def right_row(self):
+        return max((self.row(vertex) for vertex in range(len(self.vertices)) if self.bounded(vertex)), default=0)
+
+    def end_row(self, qubit: int):
+        return self.row(self.ends[qubit]) if qubit in self.ends else 0
+
+    def finish(self, padding=None) -> Layout:
+        """Pads the layout as set_left_padding does and works out how it attaches to the wires of a larger graph."""
+        bounded = [vertex for vertex in range(len(self.vertices)) if self.bounded(vertex)]
+        offset = 0 if padding is None else padding - min(self.row(vertex) for vertex in bounded)
+        self.vertices = [(ty, phase, qubit, row + offset, var) for ty, phase, qubit, row, var in self.vertices]
+        wires = {}
+        for vertex in bounded:
+            wires.setdefault(self.vertices[vertex][2], []).append(vertex)
+        # (qubit, first vertex, last vertex) of every wire the gate acts on
+        self.wires = [
+            (qubit, min(wires[qubit], key=self.row), max(reversed(wires[qubit]), key=self.row))
+            for qubit in range(self.num_qubits) if qubit in wires]
+        self.qubit_offsets = [0 if self.bounded(vertex) else 1 for vertex in range(len(self.vertices))]
+        self.edges = [(min(edge), max(edge)) for edge in sorted(self.edges, key=min)]
+        self.min_qubit, self.max_qubit = int(min(wires)), int(max(wires))
+        self.first_row = min(self.row(vertex) for vertex in bounded)
+        self.last_row = max(self.row(vertex) for vertex in bounded)
+        # first and last row of the vertices on each wire and on each lane below the register
+        self.wire_rows, self.lane_rows = {}, {}
+        for vertex, (_, _, qubit, row, _) in enumerate(self.vertices):
+            if not self.bounded(vertex):
+                rows = self.lane_rows.setdefault(qubit - self.num_qubits, [row, row])
+            elif qubit == int(qubit):
+                rows = self.wire_rows.setdefault(int(qubit), [row, row])
+            else:
+                continue
+            rows[0], rows[1] = min(rows[0], row), max(rows[1], row)
+        self.lanes = max(self.lane_rows, default=None)
+        return self
+
+
+def vertex_phase(ty, phase):
+    return (1 if ty == VertexType.H_BOX else 0) if phase is None else phase
+
+
+def template_key(gate, as_gadget: bool) -> tuple[tuple, int]:
+    """Key of the layout of a gate moved down to qubit 0, and the qubit it was moved down from."""
+    if gate.type == GateType.GADGET:
+        shift = min(gate.paulis)
+        return (GateType.GADGET, gate.x >> shift, gate.z >> shift, bool(as_gadget)), shift
+    elif gate.type in [GateType.CX, GateType.CZ]:
+        shift = min(gate.qubits)
+        return (type(gate), gate.control - shift, gate.target - shift, bool(as_gadget)), shift
+    else:
+        return (type(gate), bool(as_gadget) and gate.type != GateType.H), gate.qubit
+
+
+def template_phase(gate, as_gadget: bool) -> Optional[tuple]:
+    """Phase and variable of the phase vertex of a gate, which are left out of its template."""
+    if gate.type == GateType.GADGET:
+        return gate.phase, gate.var
+    elif gate.type in [GateType.CX, GateType.CZ]:
+        return None
+    elif as_gadget and gate.type != GateType.H:
+        gadget = Gadget.from_gate(gate)
+        return gadget.phase, gadget.var
+    else:
+        return gate.phase, gate.var if gate.type in [GateType.X_PHASE, GateType.Z_PHASE] else None
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def gate_template(key: tuple) -> Layout:
+    """Layout of a gate acting from qubit 0, shared by every gate with the same key."""
+    if key[0] == GateType.GADGET:
+        _, x, z, as_gadget = key
+        return gate_layout(Gadget.from_bits(x, z), as_gadget)
+    elif key[0] in [CX, CZ]:
+        gate_class, control, target, as_gadget = key
+        return gate_layout(gate_class(control, target), as_gadget)
+    else:
+        gate_class, as_gadget = key
+        return gate_layout(gate_class(0), as_gadget)
+
+
+def gate_layout(gate, as_gadget: bool) -> Layout:
+    if gate.type == GateType.GADGET:
+        return (gadget_layout(gate) if as_gadget else expanded_gadget_layout(gate)).finish(padding=1.5)
+    elif gate.type == GateType.CX:
+        return (cx_gadget_layout(gate) if as_gadget else cx_layout(gate)).finish()
+    elif gate.type == GateType.CZ:
+        return cz_gadget_layout(gate).finish(padding=1) if as_gadget else cz_layout(gate).finish()
+    elif as_gadget and gate.type != GateType.H:
+        return gadget_layout(Gadget.from_gate(gate)).finish()
+    else:
+        return single_layout(gate).finish()
+
+
+def single_layout(gate, layout: Optional[Layout] = None, row=None) -> Layout:
+    standalone = layout is None
+    layout = Layout(gate.qubit + 1) if standalone else layout
+    row = layout.end_row(gate.qubit) + 1 if row is None else row
+    var = gate.var if gate.type in [GateType.X_PHASE, GateType.Z_PHASE] else None
+    vertex = layout.add_vertex(gate.vertex_type, gate.qubit, row, phase=gate.phase, var=var)
+    layout.extend_wire(gate.qubit, vertex)
+    if standalone:
+        layout.phase_vertex = vertex
+    return layout
+
+
+def cx_layout(cx: CX, layout: Optional[Layout] = None) -> Layout:
+    layout = Layout(max(cx.qubits) + 1) if layout is None else layout
+    row = layout.right_row + 1
+    control = layout.add_vertex(VertexType.Z, cx.control, row)
+    target = layout.add_vertex(VertexType.X, cx.target, row)
+    layout.extend_wire(cx.control, control)
+    layout.extend_wire(cx.target, target)
+    layout.add_edge(control, target)
+    return layout
+
+
+def cz_layout(cz: CZ) -> Layout:
+    layout = Layout(max(cz.qubits) + 1)
+    control = layout.add_vertex(VertexType.Z, cz.control, 1)
+    target = layout.add_vertex(VertexType.Z, cz.target, 1)
+    hadamard = layout.add_vertex(VertexType.H_BOX, (min(cz.qubits) + max(cz.qubits)) / 2, 1)
+    layout.add_edge(control, hadamard)
+    layout.add_edge(hadamard, target)
+    return layout
+
+
+def cx_gadget_layout(cx: CX) -> Layout:
+    layout = Layout(max(cx.qubits) + 1)
+    control = layout.add_vertex(VertexType.Z, cx.control, 2, phase=1/2)
+    target = layout.add_vertex(VertexType.Z, cx.target, 2, phase=1/2)
+    hadamard1 = layout.add_vertex(VertexType.H_BOX, cx.target, 1)
+    hadamard2 = layout.add_vertex(VertexType.H_BOX, cx.target, 3)
+    phase = layout.add_vertex(VertexType.Z, layout.num_qubits + 2, 3, phase=-1/2)
+    hub = layout.add_vertex(VertexType.X, layout.num_qubits + 1, 3)
+    layout.add_edge(hadamard1, target)
+    layout.add_edge(target, hadamard2)
+    for vertex in (phase, control, target):
+        layout.add_edge(hub, vertex)
+    return layout
+
+
+def cz_gadget_layout(cz: CZ) -> Layout:
+    layout = Layout(max(cz.qubits) + 1)
+    control = layout.add_vertex(VertexType.Z, cz.control, 2, phase=1/2)
+    target = layout.add_vertex(VertexType.Z, cz.target, 2, phase=1/2)
+    phase = layout.add_vertex(VertexType.Z, layout.num_qubits + 2, 3, phase=-1/2)
+    hub = layout.add_vertex(VertexType.X, layout.num_qubits + 1, 3)
+    for vertex in (phase, control, target):
+        layout.add_edge(hub, vertex)
+    return layout
+
+
+def gadget_layout(gadget: Gadget) -> Layout:
+    layout = Layout(max(gadget.paulis) + 1)
+    offset = 0 if gadget.phase_gadget else 1
+    phase = layout.add_vertex(VertexType.Z, layout.num_qubits + 1, offset + 2, phase=gadget.phase, var=gadget.var)
+    hub = layout.add_vertex(VertexType.X, layout.num_qubits, offset + 2)
+    layout.add_edge(hub, phase)
+    layout.phase_vertex = phase
+    for qubit, pauli in gadget.paulis.items():
+        if pauli in [PauliType.X, PauliType.Y]:
+            if pauli == PauliType.X:
+                left = layout.add_vertex(VertexType.H_BOX, qubit, 1)
+                middle = layout.add_vertex(VertexType.Z, qubit, 2)
+                right = layout.add_vertex(VertexType.H_BOX, qubit, 3)
+            else:
+                left = layout.add_vertex(VertexType.X, qubit, 1, phase=1/2)
+                middle = layout.add_vertex(VertexType.Z, qubit, 2)
+                right = layout.add_vertex(VertexType.X, qubit, 3, phase=3/2)
+            layout.add_edge(middle, hub)
+            layout.add_edge(left, middle)
+            layout.add_edge(middle, right)
+        elif pauli == PauliType.Z:
+            middle = layout.add_vertex(VertexType.Z, qubit, offset + 1)
+            layout.add_edge(middle, hub)
+    return layout
+
+
+def expanded_gadget_layout(gadget: Gadget) -> Layout:
+    layout = Layout(max(gadget.paulis) + 1)
+    gadget_qubits = [qubit for qubit, pauli in gadget.paulis.items() if pauli != PauliType.I]
+    depth = 2 * len(gadget_qubits) - 1 if gadget.phase_gadget else 2 * len(gadget_qubits) + 1
+
+    def add_cliffords(row: int, reverse: bool):
+        for qubit, pauli in gadget.paulis.items():
+            if pauli == PauliType.X:
+                single_layout(H(qubit), layout, row=row)
+            elif pauli == PauliType.Y:
+                single_layout(XMinus(qubit) if reverse else XPlus(qubit), layout, row=row)
+
+    add_cliffords(1, reverse=False)
+    for left in range(len(gadget_qubits) - 1):
+        cx_layout(CX(gadget_qubits[left], gadget_qubits[left + 1]), layout)
+    qubit = max(gadget_qubits)
+    phase = layout.add_vertex(VertexType.Z, qubit, layout.end_row(qubit) + 1, phase=gadget.phase, var=gadget.var)
+    layout.extend_wire(qubit, phase)
+    layout.phase_vertex = phase
+    for left in reversed(range(len(gadget_qubits) - 1)):
+        cx_layout(CX(gadget_qubits[left], gadget_qubits[left + 1]), layout)
+    add_cliffords(depth, reverse=True)
+    return layout
+
+
+class GraphBuilder:
+    """Lays out a sequence of gates in a single pass, giving the same graph as composing the graph of each gate.
+
+    Stacked gates are placed against a skyline holding the rightmost row taken on each wire and on the hub and phase
+    lanes below the register. A gate takes every wire between its top and bottom qubits, and gadgets also take every
+    wire below them down to their lanes, so stacked gates never overlap."""
+    def __init__(self, num_qubits: int, stack: Optional[bool] = None):
+        self.graph = GadgetGraph(num_qubits=num_qubits)
+        self.stack = stack
+        self.graph.remove_edges(list(zip(self.graph.inputs(), self.graph.outputs())))
+        self.ends = list(self.graph.inputs())  # rightmost vertex on each qubit
+        self.skyline = [None] * (num_qubits + NUM_LANES)  # rightmost row taken on each wire and lane
+        self.translation = 0  # rows are stored relative to the left padding applied so far
+        self.left_row = None
+        self.right_row = None
+        self.origin = self.graph.input_row  # row the first gate is placed after
+        self.spans = []  # vertices of each gate
+        self.right_rows = []  # right row of the graph after each gate
+
+    def footprint(self, layout: Layout, shift: int) -> tuple[int, int]:
+        bottom = layout.max_qubit + shift if layout.lanes is None else self.graph.num_qubits + layout.lanes
+        return layout.min_qubit + shift, bottom
+
+    def profile(self, layout: Layout, shift: int, lane: int) -> list:
+        """First and last row of a gate on a wire or lane, with wires and lanes it only crosses taking its full span."""
+        if lane < self.graph.num_qubits:
+            return layout.wire_rows.get(lane - shift, (layout.first_row, layout.last_row))
+        return layout.lane_rows.get(lane - self.graph.num_qubits, (layout.first_row, layout.last_row))
+
+    def skyline_row(self, layout: Layout, shift: int):
+        """Leftmost row a gate can be placed at without touching anything on the wires and lanes it takes."""
+        top, bottom = self.footprint(layout, shift)
+        row = self.graph.input_row
+        for lane in range(top, bottom + 1):
+            if self.skyline[lane] is not None:
+                row = max(row, self.skyline[lane] + self.translation - self.profile(layout, shift, lane)[0] + 1)
+        return row
+
+    def position(self, gate, as_gadget: Optional[bool] = None, stack: Optional[bool] = None) -> tuple:
+        """Whether gate is drawn as a gadget, its template, its qubit shift and the row add would place it at."""
+        as_gadget = gate.as_gadget if as_gadget is None else as_gadget
+        key, shift = template_key(gate, as_gadget)
+        layout = gate_template(key)
+        stack = self.stack if stack is None else stack
+        stack = gate.stack if stack is None else stack
+        if stack:
+            row = self.skyline_row(layout, shift)
+        else:
+            row = self.graph.input_row if self.right_row is None else self.right_row + self.translation
+        return as_gadget, layout, shift, row - self.translation
+
+    def width_with(self, gate, as_gadget: Optional[bool] = None, stack: Optional[bool] = None) -> int:
+        """Number of rows the gates added so far and gate would take, without adding gate."""
+        _, layout, _, row = self.position(gate, as_gadget, stack)
+        left_row, right_row = layout.first_row + row, layout.last_row + row
+        if self.left_row is not None:
+            left_row, right_row = min(self.left_row, left_row), max(self.right_row, right_row)
+        return right_row - left_row + 1
+
+    def add(self, gate, as_gadget: Optional[bool] = None, stack: Optional[bool] = None):
+        as_gadget, layout, shift, row = self.position(gate, as_gadget, stack)
+        graph = self.graph
+        vertices = self.place(gate, as_gadget, layout, row, shift)
+        self.spans.append(range(vertices[0], vertices[-1] + 1))
+        wires = []
+        for qubit, first, last in layout.wires:
+            wires.append((self.ends[qubit + shift], vertices[first]))
+            self.ends[qubit + shift] = vertices[last]
+        self.connect(wires)
+
+        top, bottom = self.footprint(layout, shift)
+        for lane in range(top, bottom + 1):
+            last = self.profile(layout, shift, lane)[1] + row
+            self.skyline[lane] = last if self.skyline[lane] is None else max(self.skyline[lane], last)
+        left_row, right_row = layout.first_row + row, layout.last_row + row
+        self.left_row = left_row if self.left_row is None else min(self.left_row, left_row)
+        self.right_row = right_row if self.right_row is None else max(self.right_row, right_row)
+        self.translation = graph.input_row + graph.boundary_padding - self.left_row
+        self.right_rows.append(self.right_row)
+
+    def place(self, gate, as_gadget: bool, layout: Layout, row, shift: int) -> list[int]:
+        """Adds the vertices and internal edges of a gate at the given row, returning its vertices."""
+        graph = self.graph
+        offset = graph.num_qubits - layout.num_qubits
+
+        # vertices land after everything already on their wires, so each is indexed once it is placed
+        graph.indexing = False
+        vertices = graph.add_vertices(len(layout.vertices))
+        graph.indexing = True
+        graph.mutations += 1
+        for vertex, (ty, phase, qubit, vertex_row, var), qubit_offset in zip(
+                vertices, layout.vertices, layout.qubit_offsets):
+            graph.set_type(vertex, ty)
+            GraphS.set_qubit(graph, vertex, qubit + (offset if qubit_offset else shift))
+            GraphS.set_row(graph, vertex, vertex_row + row)
+            graph.index_vertex(vertex)
+            if phase:
+                graph.set_phase(vertex, phase)
+            if var is not None:
+                graph.set_vdata(vertex, 'var', var)
+        if layout.phase_vertex is not None:
+            vertex = vertices[layout.phase_vertex]
+            phase, var = template_phase(gate, as_gadget)
+            phase = vertex_phase(graph.type(vertex), phase)
+            if phase != graph.phase(vertex):
+                graph.set_phase(vertex, phase)
+            if var is not None:
+                graph.set_vdata(vertex, 'var', var)
+        graph.add_edges([(vertices[source], vertices[target]) for source, target in layout.edges])
+        return vertices
+
+    def connect(self, edges: list[tuple[int, int]]):
+        self.graph.add_edges(edges)
+
+    def add_compacted(self, gates: list, as_gadget: Optional[bool] = None):
+        """Stacks the gates, reordering commuting gadgets so that each next gadget is the one that fits furthest left.
+
+        Gadgets are never moved past a gadget they anticommute with or past any other gate."""
+        start = 0
+        for index, gate in enumerate([*gates, None]):
+            if gate is None or gate.type != GateType.GADGET:
+                self.add_gadgets(gates[start:index], as_gadget=as_gadget)
+                if gate is not None:
+                    self.add(gate, as_gadget=as_gadget, stack=True)
+                start = index + 1
+
+    def add_gadgets(self, gadgets: list[Gadget], as_gadget: Optional[bool] = None):
+        """Adds a run of gadgets, each time picking the ready gadget that fits furthest left."""
+        if not gadgets:
+            return
+        anticommuting = ~PauliTable.from_gadgets(gadgets).commutation_matrix()
+        blockers = [int(anticommuting[index, :index].sum()) for index in range(len(gadgets))]
+        templates = []
+        for gadget in gadgets:
+            key, shift = template_key(gadget, gadget.as_gadget if as_gadget is None else as_gadget)
+            templates.append((gate_template(key), shift))
+        ready = [index for index, count in enumerate(blockers) if not count]
+        while ready:
+            index = min(ready, key=lambda index: (self.skyline_row(*templates[index]), index))
+            ready.remove(index)
+            self.add(gadgets[index], as_gadget=as_gadget, stack=True)
+            for later in np.flatnonzero(anticommuting[index, index + 1:]) + index + 1:
+                blockers[later] -= 1
+                if not blockers[later]:
+                    ready.append(int(later))
+
+    def build(self) -> GadgetGraph:
+        graph = self.graph
+        graph.shift_rows(self.translation)
+        right_row = graph.input_row if self.right_row is None else self.right_row + self.translation
+        graph.set_output_row(right_row + graph.boundary_padding)
+        graph.add_edges(list(zip(self.ends, graph.outputs())))
+        self.untranslate()
+        return graph
+
+    def untranslate(self):
+        """Moves the rows kept by the builder onto the rows of the graph, once the graph has been shifted."""
+        if self.translation:
+            self.origin += self.translation
+            self.left_row += self.translation
+            self.right_row += self.translation
+            self.right_rows = [row + self.translation for row in self.right_rows]
+            self.translation = 0
+
+    def replace(self, start: int, end: int, gates: list, as_gadget: Optional[bool] = None):
+        """Lays out gates in place of the gates added from start to end of a built, unstacked graph.
+
+        Only the new gates are laid out. The vertices of the gates after end are kept and moved by the change in
+        width. The new gates should not be empty when start is 0."""
+        graph = self.graph
+        old_row = self.right_rows[end - 1] if end else self.origin
+        graph.remove_vertices([vertex for span in self.spans[start:end] for vertex in span])
+        suffix = [vertex for span in self.spans[end:] for vertex in span]
+        suffix.sort(key=graph.index_key, reverse=True)
+        for vertex in suffix:
+            graph.unindex_vertex(vertex)
+
+        # only the gates before start are left in the index, and the suffix is sorted right to left
+        firsts = {}
+        for vertex in reversed(suffix):
+            firsts.setdefault(graph.qubit(vertex), vertex)
+        inputs, outputs = graph.inputs(), graph.outputs()
+        self.ends, rights = [], []
+        for qubit in range(graph.num_qubits):
+            vertices = graph.qubit_index.get(qubit)
+            left = vertices[-1] if vertices else inputs[qubit]
+            right = firsts.get(qubit, outputs[qubit])
+            if graph.connected(left, right):
+                graph.remove_edge(graph.edge(left, right))
+            self.ends.append(left)
+            rights.append(right)
+
+        suffix_spans, suffix_rows = self.spans[end:], self.right_rows[end:]
+        del self.spans[start:], self.right_rows[start:]
+        self.right_row = self.right_rows[-1] if start else None
+        self.left_row = self.left_row if start else None
+        self.origin = self.origin if start else graph.input_row
+        for gate in gates:
+            self.add(gate, as_gadget=as_gadget, stack=False)
+        if self.translation:
+            for span in self.spans[start:]:
+                for vertex in span:
+                    graph.set_row(vertex, graph.row(vertex) + self.translation)
+            self.untranslate()
+
+        new_row = self.origin if self.right_row is None else self.right_row
+        offset = new_row - old_row
+        graph.mutations += 1
+        for vertex in reversed(suffix):
+            if offset:
+                GraphS.set_row(graph, vertex, graph.row(vertex) + offset)
+            graph.index_vertex(vertex)
+        graph.add_edges(list(zip(self.ends, rights)))
+        if offset:
+            graph.set_output_row(graph.row(outputs[0]) + offset)
+        self.spans += suffix_spans
+        self.right_rows += [row + offset for row in suffix_rows]
+        self.right_row = self.right_rows[-1] if self.right_rows else None
+        self.ends = [next(iter(graph.neighbors(output))) for output in outputs]
+
+
+class LayoutBuilder(GraphBuilder):
+    """Lays out gates as GraphBuilder does, writing vertices and edges into arrays instead of a pyzx graph.
+
+    Only the inputs and outputs are held in a pyzx graph. The other vertices are numbered after them in the order
+    they are added, as GraphBuilder numbers them, so the two give the same TikZ output."""
+    def __init__(self, num_qubits: int, stack: Optional[bool] = None):
+        super().__init__(num_qubits=num_qubits, stack=stack)
+        self.num_boundaries = self.num_vertices = self.graph.num_vertices()
+        self.types = array('B')
+        self.qubits = array('d')
+        self.rows = array('d')
+        self.numerators = array('q')
+        self.denominators = array('q')
+        self.edges = array('q')  # source and target of each edge, one after the other
+        self.variables = {}  # vertex -> variable of its phase
+
+    def place(self, gate, as_gadget: bool, layout: Layout, row, shift: int) -> range:
+        offset = self.graph.num_qubits - layout.num_qubits
+        first = self.num_vertices
+        for (ty, phase, qubit, vertex_row, var), qubit_offset in zip(layout.vertices, layout.qubit_offsets):
+            numerator, denominator = phase_fraction(phase)
+            self.types.append(ty)
+            self.qubits.append(qubit + (offset if qubit_offset else shift))
+            self.rows.append(vertex_row + row)
+            self.numerators.append(numerator)
+            self.denominators.append(denominator)
+            if var is not None:
+                self.variables[self.num_vertices] = var
+            self.num_vertices += 1
+        if layout.phase_vertex is not None:
+            vertex = first + layout.phase_vertex
+            position = vertex - self.num_boundaries
+            phase, var = template_phase(gate, as_gadget)
+            numerator, denominator = phase_fraction(vertex_phase(self.types[position], phase))
+            self.numerators[position], self.denominators[position] = numerator, denominator
+            if var is not None:
+                self.variables[vertex] = var
+        for source, target in layout.edges:
+            self.edges.extend((first + source, first + target))
+        return range(first, self.num_vertices)
+
+    def connect(self, edges: list[tuple[int, int]]):
+        for source, target in edges:
+            self.edges.extend((source, target))
+
+    def build(self) -> LayoutGraph:
+        graph = self.graph
+        right_row = graph.input_row if self.right_row is None else self.right_row + self.translation
+        boundaries = list(graph.vertices())
+        assert boundaries == list(range(self.num_boundaries))
+        outputs = set(graph.outputs())
+        boundary_rows = [right_row + graph.boundary_padding if vertex in outputs else graph.row(vertex)
+                         for vertex in boundaries]
+        self.connect(list(zip(self.ends, graph.outputs())))
+        rows = np.frombuffer(self.rows, dtype=np.float64) + self.translation
+        self.untranslate()
+
+        # pyzx lists each edge from its lower vertex, grouping edges by that vertex in the order they were added
+        edges = np.sort(np.frombuffer(self.edges, dtype=np.int64).reshape(-1, 2), axis=1)
+        edges = edges[np.argsort(edges[:, 0], kind='stable')]
+        return LayoutGraph(
+            num_qubits=graph.num_qubits,
+            ids=np.arange(self.num_vertices, dtype=np.int64),
+            types=np.concatenate([
+                np.array([graph.type(vertex) for vertex in boundaries], dtype=np.uint8),
+                np.frombuffer(self.types, dtype=np.uint8)]),
+            qubits=np.concatenate([
+                np.array([graph.qubit(vertex) for vertex in boundaries], dtype=np.float64),
+                np.frombuffer(self.qubits, dtype=np.float64)]),
+            rows=np.concatenate([np.array(boundary_rows, dtype=np.float64), rows]),
+            numerators=np.concatenate([np.zeros(self.num_boundaries, dtype=np.int64),
+                                       np.frombuffer(self.numerators, dtype=np.int64)]),
+            denominators=np.concatenate([np.ones(self.num_boundaries, dtype=np.int64),
+                                         np.frombuffer(self.denominators, dtype=np.int64)]),
+            edges=edges,
+            edge_types=np.full(len(edges), EdgeType.SIMPLE, dtype=np.uint8),
+            inputs=np.array(graph.inputs(), dtype=np.int64),
+            outputs=np.array(graph.outputs(), dtype=np.int64),
+            variables=self.variables)
@@ -145,12 +145,13 @@ class GadgetGraph(BaseGraph):
                 elif pauli == PauliType.Y:
                     self.add(XMinus(qubit) if reverse else XPlus(qubit), row=row)
 
-        add_cliffords(in_row, reverse=False)
-        add_cnots(len(gadget_qubits) - 1, reverse=False)
+        with self.deferred_layout():
+            add_cliffords(in_row, reverse=False)
+            add_cnots(len(gadget_qubits) - 1, reverse=False)
 
-        phase_node = self.add(ZPhase(max(gadget_qubits), gadget.phase))
-        if gadget.var is not None:
-            self.set_vdata(vertex=phase_node, key='var', val=gadget.var)
+            phase_node = self.add(ZPhase(max(gadget_qubits), gadget.phase))
+            if gadget.var is not None:
+                self.set_vdata(vertex=phase_node, key='var', val=gadget.var)
 
-        add_cnots(len(gadget_qubits) - 1, reverse=True)
-        add_cliffords(in_row + depth - 1, reverse=True)
+            add_cnots(len(gadget_qubits) - 1, reverse=True)
+            add_cliffords(in_row + depth - 1, reverse=True)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+from zxfermion.cache import ArtefactCache, copy_atomic
+from zxfermion.exceptions import LatexException
+from zxfermion.utils import settings
+
+if TYPE_CHECKING:
+    from zxfermion.graphs import BaseGraph, LayoutGraph
+
+TEMPLATE = Path('tikz/template.tex')
+STYLES = Path('tikz/styles.tikzstyles')
+PLACEHOLDER = 'TIKZ_PICTURE'
+
+
+def template_parts(template: Path = TEMPLATE) -> tuple[str, str]:
+    """The document before and after the picture in the template."""
+    head, tail = Path(template).read_text().split(PLACEHOLDER)
+    return head, tail
+
+
+def content_hash(tex: str, engine: str) -> str:
+    """Hash of a document together with what it is compiled with: the engine and the TikZ styles it inputs."""
+    digest = hashlib.sha256(engine.encode())
+    digest.update(b'\0' + tex.encode())
+    if STYLES.exists():
+        digest.update(b'\0' + STYLES.read_bytes())
+    return digest.hexdigest()
+
+
+def run_latex(tex_path: Path, engine: str) -> Path:
+    """Compiles a document in a scratch directory of its own and returns the path of the PDF."""
+    directory = Path(tempfile.mkdtemp(prefix='zxfermion-'))
+    command = [engine, '-interaction=nonstopmode', '-halt-on-error', f'-output-directory={directory}', str(tex_path)]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise LatexException(f'{engine} was not found')
+    pdf = directory / f'{tex_path.stem}.pdf'
+    if result.returncode or not pdf.exists():
+        shutil.rmtree(directory, ignore_errors=True)
+        raise LatexException(f'{engine} failed on {tex_path}\n{result.stdout[-2000:]}')
+    return pdf
+
+
+@contextmanager
+def run_all(tex_paths: list[Path], engine: str, processes: Optional[int]) -> Iterator[list[Path]]:
+    """PDFs of the documents in order, compiled by up to `processes` LaTeX processes at once.
+
+    Raises the first LatexException, if any document fails. The scratch directories of the PDFs are removed on
+    leaving the block, or straight away if a document fails."""
+    with ThreadPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        futures = [pool.submit(run_latex, path, engine) for path in tex_paths]
+    pdfs = [future.result() for future in futures if future.exception() is None]
+    try:
+        for future in futures:
+            future.result()
+        yield pdfs
+    finally:
+        for pdf in pdfs:
+            shutil.rmtree(pdf.parent, ignore_errors=True)
+
+
+def artefact_cache(cache: ArtefactCache | str | Path | bool | None) -> Optional[ArtefactCache]:
+    """The cache of settings.cache_directory, if any, for None, no cache for False, and otherwise the given cache or a
+    cache in the given directory."""
+    if cache is None:
+        return ArtefactCache.from_settings()
+    if cache is False:
+        return None
+    return cache if isinstance(cache, ArtefactCache) else ArtefactCache(cache, settings.cache_max_bytes)
+
+
+def fetch_all(cache: Optional[ArtefactCache], keys: list[str], outputs: list[Path]) -> dict[str, list[Path]]:
+    """Copies the cached PDFs to their outputs, and returns the outputs of the other keys by key."""
+    pending = {}
+    for key, output in zip(keys, outputs):
+        if cache is None or not cache.fetch(key, '.pdf', output):
+            pending.setdefault(key, []).append(output)
+    return pending
+
+
+def deliver(cache: Optional[ArtefactCache], key: str, pdf: Path, outputs: list[Path]):
+    """Stores a freshly compiled PDF in the cache and copies it to its outputs."""
+    if cache is not None:
+        cache.store(key, '.pdf', pdf)
+    for output in outputs:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        copy_atomic(pdf, output)
+
+
+def compile_pdfs(
+        tex_paths: Iterable[str | Path],
+        outputs: Optional[Iterable[str | Path]] = None,
+        engine: str = settings.latex_engine,
+        processes: Optional[int] = None,
+        cache: ArtefactCache | str | Path | bool | None = None) -> list[Path]:
+    """Compiles documents through a pool of LaTeX processes and returns the paths of their PDFs.
+
+    Each PDF is written next to its document unless outputs are given. Identical documents are compiled once, and
+    documents whose content hash is in the cache are not compiled at all. The cache is that of
+    settings.cache_directory unless another is given, and False turns it off."""
+    tex_paths = [Path(path) for path in tex_paths]
+    outputs = [path.with_suffix('.pdf') for path in tex_paths] if outputs is None else [Path(path) for path in outputs]
+    assert len(outputs) == len(tex_paths)
+    cache = artefact_cache(cache)
+    keys = [content_hash(path.read_text(), engine) for path in tex_paths]
+    pending = fetch_all(cache, keys, outputs)
+    sources = {}
+    for key, path in zip(keys, tex_paths):
+        sources.setdefault(key, path)
+    with run_all([sources[key] for key in pending], engine, processes) as pdfs:
+        for (key, targets), pdf in zip(pending.items(), pdfs):
+            deliver(cache, key, pdf, targets)
+    return outputs
+
+
+def split_pages(pdf: Path, targets: list[Path]):
+    """Writes each page of a PDF to a file of its own."""
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise ImportError('splitting batched pictures into pages needs pypdf: pip install pypdf')
+    reader = PdfReader(pdf)
+    if len(reader.pages) != len(targets):
+        raise LatexException(f'expected {len(targets)} pages in {pdf} but found {len(reader.pages)}')
+    for page, target in zip(reader.pages, targets):
+        writer = PdfWriter()
+        writer.add_page(page)
+        with open(target, 'wb') as file:
+            writer.write(file)
+
+
+def compile_pictures(
+        pictures: dict[str, str],
+        directory: str | Path = 'output',
+        engine: str = settings.latex_engine,
+        batch_size: Optional[int] = None,
+        processes: Optional[int] = None,
+        cache: ArtefactCache | str | Path | bool | None = None,
+        template: Path = TEMPLATE) -> list[Path]:
+    """Compiles TikZ pictures, given by name, into `{directory}/{name}.pdf` and returns the paths of the PDFs.
+
+    Every picture is cached, as for compile_pdfs, under the hash of the document `BaseGraph.tex` would write for it.
+    With a batch_size, pictures not yet cached are packed batch_size at a time into one document, which the
+    template's preview package turns into one page per picture, and the pages are split apart with pypdf. This saves
+    a LaTeX start-up per picture."""
+    head, tail = template_parts(template)
+    keys = [content_hash(head + picture.strip() + tail, engine) for picture in pictures.values()]
+    outputs = [Path(directory) / f'{name}.pdf' for name in pictures]
+    cache = artefact_cache(cache)
+    pending = fetch_all(cache, keys, outputs)
+    bodies = {key: picture.strip() for key, picture in zip(keys, pictures.values())}
+    with tempfile.TemporaryDirectory(prefix='zxfermion-') as scratch:
+        if batch_size is None:
+            batches = [[key] for key in pending]
+        else:
+            batches = [list(pending)[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        tex_paths = []
+        for number, batch in enumerate(batches):
+            tex_paths.append(Path(scratch) / f'batch_{number}.tex')
+            tex_paths[-1].write_text(head + '\n\n'.join(bodies[key] for key in batch) + tail)
+        with run_all(tex_paths, engine, processes) as pdfs:
+            for batch, pdf in zip(batches, pdfs):
+                pages = [pdf] if len(batch) == 1 else [pdf.parent / f'page_{key}.pdf' for key in batch]
+                if len(batch) > 1:
+                    split_pages(pdf, pages)
+                for key, page in zip(batch, pages):
+                    deliver(cache, key, page, pending[key])
+    return outputs
+
+
+def export_pdfs(
+        graphs: dict[str, BaseGraph | LayoutGraph],
+        directory: str | Path = 'output',
+        scale: float = settings.tikz_scale,
+        **kwargs) -> list[Path]:
+    """Compiles graphs, or LayoutGraphs, given by name into PDFs. Takes the keyword arguments of compile_pictures."""
+    from zxfermion.graphs.tikz import to_tikz
+    return compile_pictures({name: to_tikz(graph, scale=scale) for name, graph in graphs.items()}, directory, **kwargs)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from fractions import Fraction
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pyzx as zx
+
+from zxfermion.graphs.base_graph import BaseGraph
+from zxfermion.graphs.gadget_graph import GadgetGraph
+from zxfermion.utils import settings
+
+MAX_DENOMINATOR = 2 ** 62
+
+
+@lru_cache(maxsize=1024)
+def phase_fraction(phase) -> tuple[int, int]:
+    """Numerator and denominator of a phase as pyzx stores it, small enough for int64."""
+    fraction = Fraction(phase) % 2
+    if fraction.denominator > MAX_DENOMINATOR:
+        fraction = fraction.limit_denominator(MAX_DENOMINATOR)
+    return fraction.numerator, fraction.denominator
+
+
+class LayoutGraph:
+    """Type, phase, qubit and row of every vertex of a laid out diagram and its edges, held in NumPy arrays.
+
+    Holds what drawing and TikZ export need and nothing more, in about 50 bytes per vertex and 17 bytes per edge.
+    Vertices are referred to by position in the arrays. `ids` keeps the vertex numbering of the graph the layout
+    was taken from, which is what TikZ output uses to name nodes."""
+    def __init__(
+            self,
+            num_qubits: int,
+            ids: np.ndarray,
+            types: np.ndarray,
+            qubits: np.ndarray,
+            rows: np.ndarray,
+            numerators: np.ndarray,
+            denominators: np.ndarray,
+            edges: np.ndarray,
+            edge_types: np.ndarray,
+            inputs: np.ndarray,
+            outputs: np.ndarray,
+            variables: Optional[dict[int, str]] = None):
+        assert len(ids) == len(types) == len(qubits) == len(rows) == len(numerators) == len(denominators)
+        assert edges.shape == (len(edge_types), 2)
+        self.num_qubits = num_qubits
+        self.ids = ids
+        self.types = types
+        self.qubits = qubits
+        self.rows = rows
+        self.numerators = numerators
+        self.denominators = denominators
+        self.edges = edges
+        self.edge_types = edge_types
+        self.inputs = inputs
+        self.outputs = outputs
+        self.variables = {} if variables is None else variables  # position -> variable of the phase
+
+    def num_vertices(self) -> int:
+        return len(self.ids)
+
+    def num_edges(self) -> int:
+        return len(self.edges)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.ids, self.types, self.qubits, self.rows, self.numerators, self.denominators, self.edges,
+                  self.edge_types, self.inputs, self.outputs)
+        return sum(array.nbytes for array in arrays)
+
+    def phase(self, position: int) -> Fraction:
+        return Fraction(int(self.numerators[position]), int(self.denominators[position]))
+
+    @classmethod
+    def from_graph(cls, graph: BaseGraph) -> LayoutGraph:
+        vertices = list(graph.vertices())
+        index = {vertex: position for position, vertex in enumerate(vertices)}
+        phases = np.array([phase_fraction(graph.phase(vertex)) for vertex in vertices], dtype=np.int64).reshape(-1, 2)
+        edges = list(graph.edges())
+        return cls(
+            num_qubits=graph.num_qubits,
+            ids=np.array(vertices, dtype=np.int64),
+            types=np.array([graph.type(vertex) for vertex in vertices], dtype=np.uint8),
+            qubits=np.array([graph.qubit(vertex) for vertex in vertices], dtype=np.float64),
+            rows=np.array([graph.row(vertex) for vertex in vertices], dtype=np.float64),
+            numerators=phases[:, 0].copy(),
+            denominators=phases[:, 1].copy(),
+            edges=np.array([(index[source], index[target]) for source, target in edges], dtype=np.int64).reshape(-1, 2),
+            edge_types=np.array([graph.graph[source][target] for source, target in edges], dtype=np.uint8),
+            inputs=np.array([index[vertex] for vertex in graph.inputs()], dtype=np.int64),
+            outputs=np.array([index[vertex] for vertex in graph.outputs()], dtype=np.int64),
+            variables={
+                index[vertex]: var for vertex in vertices
+                if (var := graph.vdata(vertex, 'var', None)) is not None})
+
+    def to_graph(self) -> GadgetGraph:
+        graph = GadgetGraph(num_qubits=0)
+        graph.num_qubits = self.num_qubits
+        ids = self.ids.tolist()
+        graph.indexing = False
+        for position, (vertex, ty, qubit, row, numerator, denominator) in enumerate(zip(
+                ids, self.types.tolist(), self.qubits.tolist(), self.rows.tolist(),
+                self.numerators.tolist(), self.denominators.tolist())):
+            graph.add_vertex_indexed(vertex)
+            graph.set_type(vertex, ty)
+            graph.set_qubit(vertex, int(qubit) if qubit.is_integer() else qubit)
+            graph.set_row(vertex, int(row) if row.is_integer() else row)
+            if numerator:
+                graph.set_phase(vertex, Fraction(numerator, denominator))
+            if position in self.variables:
+                graph.set_vdata(vertex, 'var', self.variables[position])
+        graph.set_inputs(tuple(ids[position] for position in self.inputs.tolist()))
+        graph.set_outputs(tuple(ids[position] for position in self.outputs.tolist()))
+        graph.indexing = True
+        for vertex in sorted(set(ids) - graph.boundary_set, key=graph.index_key):
+            graph.index_vertex(vertex)
+        for (source, target), edge_type in zip(self.edges.tolist(), self.edge_types.tolist()):
+            graph.add_edge((ids[source], ids[target]), edge_type)
+        return graph
+
+    tikz = BaseGraph.tikz
+    tex = BaseGraph.tex
+    pdf = BaseGraph.pdf
+    svg = BaseGraph.svg
+    clipboard = BaseGraph.clipboard
+
+    def draw(self, labels: bool = settings.labels):
+        zx.draw(self.to_graph(), labels=labels)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import unicodedata
+from functools import lru_cache
+from html import escape
+from typing import Iterator, TextIO
+
+from pyzx.utils import VertexType, EdgeType
+
+from zxfermion.graphs.base_graph import BaseGraph
+from zxfermion.graphs.layout_graph import LayoutGraph
+from zxfermion.graphs.tikz import CHUNK_SIZE, labelled, vertex_style
+from zxfermion.utils import settings
+
+# SVG counterparts of the styles in tikz/styles.tikzstyles, by the names used in settings.tikz_classes
+SVG_STYLES: dict[str, str] = {
+    'z_node': 'fill:#d8f8d8;stroke:#000',
+    'x_node': 'fill:#e8a5a5;stroke:#000',
+    'y_node': 'fill:#58b8f4;stroke:#000',
+    'z_phase': 'fill:#d8f8d8;stroke:#000',
+    'x_phase': 'fill:#e8a5a5;stroke:#000',
+    'y_phase': 'fill:#58b8f4;stroke:#000',
+    'hadamard': 'fill:#ffd700;stroke:#000',
+    'black': 'fill:#000;stroke:#000',
+    'white': 'fill:#fff;stroke:#000',
+    'box': 'fill:#fff;stroke:#000',
+    'blue_solid': 'stroke:#00f;stroke-width:2',
+    'blue_dashed': 'stroke:#00f;stroke-dasharray:4 3',
+}
+MARGIN = 0.5  # space around the diagram, in rows
+NODE_RADIUS = 0.18
+BOUNDARY_RADIUS = 0.08
+HADAMARD_SIZE = 0.3
+PHASE_HEIGHT = 0.45
+CHARACTER_WIDTH = 0.17
+
+
+@lru_cache(maxsize=None)
+def symbol(var: str) -> str:
+    r"""Unicode character of a LaTeX greek letter such as \pi or \Theta, or the variable itself."""
+    name = var.lstrip('\\')
+    case = 'CAPITAL' if name[:1].isupper() else 'SMALL'
+    try:
+        return unicodedata.lookup(f'GREEK {case} LETTER {name.upper()}')
+    except KeyError:
+        return name
+
+
+@lru_cache(maxsize=4096)
+def phase_text(numerator: int, denominator: int, var: str) -> str:
+    if var == r'\pi' and denominator == 2:
+        if numerator == 1:
+            return '+'
+        elif numerator == 3:
+            return '−'
+    numerator = '' if numerator == 1 else str(numerator)
+    denominator = '' if denominator == 1 else f'/{denominator}'
+    return escape(f'{numerator}{symbol(var)}{denominator}')
+
+
+def stylesheet(scale: float) -> str:
+    styles = [f'line{{stroke:#000;stroke-width:{0.04 * scale:.2f}}}',
+              f'text{{font:{0.28 * scale:.2f}px serif;text-anchor:middle;dominant-baseline:central}}']
+    styles += [f'.{name}{{{style}}}' for name, style in SVG_STYLES.items()]
+    return ''.join(styles)
+
+
+def class_attribute(style: str) -> str:
+    return f' class="{style}"' if style else ''
+
+
+class Canvas:
+    """Maps rows and qubits to pixels, `scale` pixels apart, with the top-left vertex at (MARGIN, MARGIN)."""
+    def __init__(self, graph: LayoutGraph, scale: float):
+        self.scale = scale
+        if graph.num_vertices():
+            self.left, self.top = float(graph.rows.min()), float(graph.qubits.min())
+            right, bottom = float(graph.rows.max()), float(graph.qubits.max())
+        else:
+            self.left = self.top = right = bottom = 0.0
+        self.width = (right - self.left + 2 * MARGIN) * scale
+        self.height = (bottom - self.top + 2 * MARGIN) * scale
+
+    def x(self, row: float) -> float:
+        return (row - self.left + MARGIN) * self.scale
+
+    def y(self, qubit: float) -> float:
+        return (qubit - self.top + MARGIN) * self.scale
+
+
+def vertex_elements(graph: LayoutGraph, canvas: Canvas) -> Iterator[str]:
+    scale = canvas.scale
+    for start in range(0, graph.num_vertices(), CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        for position, type, row, qubit, numerator, denominator in zip(
+                range(start, start + CHUNK_SIZE), graph.types[block].tolist(), graph.rows[block].tolist(),
+                graph.qubits[block].tolist(), graph.numerators[block].tolist(), graph.denominators[block].tolist()):
+            x, y = canvas.x(row), canvas.y(qubit)
+            style = class_attribute(vertex_style(type, numerator))
+            label = phase_text(numerator, denominator, graph.variables.get(position, settings.tikz_var)) \
+                if labelled(type, numerator, denominator) else ''
+            if type == VertexType.BOUNDARY:
+                yield f'<circle{style} cx="{x:.2f}" cy="{y:.2f}" r="{BOUNDARY_RADIUS * scale:.2f}"/>'
+            elif type == VertexType.H_BOX or label:
+                width = max(HADAMARD_SIZE if type == VertexType.H_BOX else PHASE_HEIGHT, CHARACTER_WIDTH * len(label))
+                height = HADAMARD_SIZE if type == VertexType.H_BOX and not label else PHASE_HEIGHT
+                corner = 0 if type == VertexType.H_BOX else height / 2
+                yield (f'<rect{style} x="{x - width * scale / 2:.2f}" y="{y - height * scale / 2:.2f}" '
+                       f'width="{width * scale:.2f}" height="{height * scale:.2f}" rx="{corner * scale:.2f}"/>')
+                if label:
+                    yield f'<text x="{x:.2f}" y="{y:.2f}">{label}</text>'
+            else:
+                yield f'<circle{style} cx="{x:.2f}" cy="{y:.2f}" r="{NODE_RADIUS * scale:.2f}"/>'
+
+
+def edge_elements(graph: LayoutGraph, canvas: Canvas) -> Iterator[str]:
+    """Edges, with a hadamard box halfway along the hadamard edges that meet a boundary."""
+    types, rows, qubits = graph.types, graph.rows, graph.qubits
+    hadamard_edge = class_attribute(settings.tikz_classes['hadamard_edge'])
+    edge = class_attribute(settings.tikz_classes['edge'])
+    hadamard = class_attribute(settings.tikz_classes['hadamard'])
+    size = HADAMARD_SIZE * canvas.scale
+    for start in range(0, graph.num_edges(), CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        sources, targets = graph.edges[block, 0], graph.edges[block, 1]
+        boundary = (types[sources] == VertexType.BOUNDARY) | (types[targets] == VertexType.BOUNDARY)
+        for x1, y1, x2, y2, type, on_boundary in zip(
+                canvas.x(rows[sources]).tolist(), canvas.y(qubits[sources]).tolist(),
+                canvas.x(rows[targets]).tolist(), canvas.y(qubits[targets]).tolist(),
+                graph.edge_types[block].tolist(), boundary.tolist()):
+            if type != EdgeType.HADAMARD:
+                yield f'<line{edge} x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}"/>'
+            elif not on_boundary:
+                yield f'<line{hadamard_edge} x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}"/>'
+            else:
+                x, y = (x1 + x2) / 2, (y1 + y2) / 2
+                yield f'<line{edge} x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}"/>'
+                yield (f'<rect{hadamard} x="{x - size / 2:.2f}" y="{y - size / 2:.2f}" '
+                       f'width="{size:.2f}" height="{size:.2f}"/>')
+
+
+def svg_chunks(graph: BaseGraph | LayoutGraph, scale: float) -> Iterator[str]:
+    """Pieces of the SVG image of a graph, in order, one element at a time. Edges are drawn below vertices."""
+    graph = graph if isinstance(graph, LayoutGraph) else LayoutGraph.from_graph(graph)
+    canvas = Canvas(graph, scale)
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{canvas.width:.2f}" height="{canvas.height:.2f}" '
+           f'viewBox="0 0 {canvas.width:.2f} {canvas.height:.2f}">\n<style>{stylesheet(scale)}</style>\n')
+    for element in edge_elements(graph, canvas):
+        yield element + '\n'
+    for element in vertex_elements(graph, canvas):
+        yield element + '\n'
+    yield '</svg>\n'
+
+
+def write_svg(graph: BaseGraph | LayoutGraph, file: TextIO, scale: float = settings.svg_scale):
+    """Writes the SVG image of a graph to an open file without holding the whole image in memory."""
+    for chunk in svg_chunks(graph, scale=scale):
+        file.write(chunk)
+
+
+def to_svg(graph: BaseGraph | LayoutGraph, scale: float = settings.svg_scale) -> str:
+    return ''.join(svg_chunks(graph, scale=scale))
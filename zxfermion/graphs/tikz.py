@@ -1,6 +1,13 @@
-from typing import Optional
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import chain
+from typing import Iterator, TextIO
+
+import numpy as np
 
 from zxfermion.graphs.base_graph import BaseGraph
+from zxfermion.graphs.layout_graph import LayoutGraph
 from zxfermion.utils import settings
 from pyzx.utils import VertexType, EdgeType
 
@@ -15,69 +22,111 @@ tikz_template = r"""
     \end{{tikzpicture}}
 """
 
+CHUNK_SIZE = 4096  # vertices or edges turned into Python values at a time
+
+
+@lru_cache(maxsize=4096)
+def phase_label(numerator: int, denominator: int, var: str) -> str:
+    numerator = '' if numerator == 1 else str(numerator)
+    denominator = '' if denominator == 1 else str(denominator)
+    phase = rf'$\frac{{{numerator}{var}}}{{{denominator}}}$' if denominator else rf'${numerator}{var}$'
+    if phase == r'$\frac{\pi}{2}$':
+        return r'$+$'
+    elif phase == r'$\frac{3\pi}{2}$':
+        return r'$-$'
+    return phase
+
+
+def vertex_style(type: int, numerator: int) -> str:
+    if type == VertexType.BOUNDARY:
+        return settings.tikz_classes['boundary']
+    elif type == VertexType.H_BOX:
+        return settings.tikz_classes['hadamard']
+    elif numerator != 0:
+        return settings.tikz_classes['z_phase' if type == VertexType.Z else 'x_phase']
+    else:
+        return settings.tikz_classes['z_node' if type == VertexType.Z else 'x_node']
 
-def to_tikz(graph: BaseGraph, scale: float) -> str:
-    max_index = 0
-    vertices = []
-    for vertex in graph.vertices():
-        type = graph.type(vertex)
-        phase = graph.phase(vertex)
-        if type == VertexType.BOUNDARY:
-            style = settings.tikz_classes['boundary']
-        elif type == VertexType.H_BOX:
-            style = settings.tikz_classes['hadamard']
-        else:
-            if phase != 0:
-                if type == VertexType.Z:
-                    style = settings.tikz_classes['z_phase']
-                else:
-                    style = settings.tikz_classes['x_phase']
+
+def labelled(type: int, numerator: int, denominator: int) -> bool:
+    if type == VertexType.H_BOX:
+        return not numerator == denominator == 1
+    return numerator != 0
+
+
+def vertex_lines(graph: LayoutGraph) -> Iterator[str]:
+    for start in range(0, graph.num_vertices(), CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        for position, vertex, type, row, qubit, numerator, denominator in zip(
+                range(start, start + CHUNK_SIZE), graph.ids[block].tolist(), graph.types[block].tolist(),
+                graph.rows[block].tolist(), graph.qubits[block].tolist(), graph.numerators[block].tolist(),
+                graph.denominators[block].tolist()):
+            if labelled(type, numerator, denominator):
+                phase = phase_label(numerator, denominator, graph.variables.get(position, settings.tikz_var))
             else:
-                if type == VertexType.Z:
-                    style = settings.tikz_classes['z_node']
-                else:
-                    style = settings.tikz_classes['x_node']
-
-        if (type == VertexType.H_BOX and phase == 1) or (type != VertexType.H_BOX and phase == 0):
-            phase = ''
-        else:
-            var = settings.tikz_var if (vdata_var := graph.vdata(vertex, 'var', default=None)) is None else vdata_var
-            numerator = '' if phase.numerator == 1 else str(phase.numerator)
-            denominator = '' if phase.denominator == 1 else str(phase.denominator)
-            phase = rf'$\frac{{{numerator}{var}}}{{{denominator}}}$' if denominator else rf'${numerator}{var}$'
-            if phase == r'$\frac{\pi}{2}$':
-                phase = r'$+$'
-            elif phase == r'$\frac{3\pi}{2}$':
-                phase = r'$-$'
-
-        x = graph.row(vertex)
-        y = - graph.qubit(vertex)
-        s = '        \\node [style={}] ({:d}) at ({:.2f}, {:.2f}) {{{:s}}};'.format(style, vertex, x, y, phase)
-        vertices.append(s)
-        max_index = vertex
-
-    edges = []
-    for edge in graph.edges():
-        source, target = graph.edge_st(edge)
-        type = graph.edge_type(edge)
-        s = '        \\draw '
-        if type == EdgeType.HADAMARD:
-            if graph.type(source) != VertexType.BOUNDARY and graph.type(target) != VertexType.BOUNDARY:
-                style = settings.tikz_classes['hadamard_edge']
-                if style:
-                    s += f'[style={style}] '
+                phase = ''
+            yield '        \\node [style={}] ({:d}) at ({:.2f}, {:.2f}) {{{:s}}};'.format(
+                vertex_style(type, numerator), vertex, row, 0.0 - qubit, phase)
+
+
+def hadamard_lines(graph: LayoutGraph) -> Iterator[str]:
+    """Nodes drawn halfway along the hadamard edges that meet a boundary, listed after the vertices."""
+    sources, targets = graph.edges[:, 0], graph.edges[:, 1]
+    boundary = (graph.types[sources] == VertexType.BOUNDARY) | (graph.types[targets] == VertexType.BOUNDARY)
+    for edge in np.flatnonzero((graph.edge_types == EdgeType.HADAMARD) & boundary).tolist():
+        source, target = int(sources[edge]), int(targets[edge])
+        x = (float(graph.rows[source]) + float(graph.rows[target])) / 2.0
+        y = -(float(graph.qubits[source]) + float(graph.qubits[target])) / 2.0
+        yield '        \\node [style={:s}] ({:d}) at ({:.2f}, {:.2f}) {{}};'.format(
+            settings.tikz_classes['hadamard'], 1, x, y)
+
+
+def edge_lines(graph: LayoutGraph) -> Iterator[str]:
+    ids, types = graph.ids, graph.types
+    for start in range(0, graph.num_edges(), CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        edges, edge_types = graph.edges[block], graph.edge_types[block]
+        for source, target, source_type, target_type, type in zip(
+                ids[edges[:, 0]].tolist(), ids[edges[:, 1]].tolist(), types[edges[:, 0]].tolist(),
+                types[edges[:, 1]].tolist(), edge_types.tolist()):
+            s = '        \\draw '
+            if type == EdgeType.HADAMARD:
+                if source_type != VertexType.BOUNDARY and target_type != VertexType.BOUNDARY:
+                    style = settings.tikz_classes['hadamard_edge']
+                    if style:
+                        s += f'[style={style}] '
             else:
-                x = (graph.row(source) + graph.row(target)) / 2.0
-                y = -(graph.qubit(source) + graph.qubit(target)) / 2.0
-                t = '        \\node [style={:s}] ({:d}) at ({:.2f}, {:.2f}) {{}};'.format(
-                    settings.tikz_classes['hadamard'], 1, x, y)
-                vertices.append(t)
-                max_index += 1
-        else:
-            style = settings.tikz_classes['edge']
-            if style:
-                s += "[style={:s}] ".format(style)
-        s += "({:d}) to ({:d});".format(source, target)
-        edges.append(s)
-
-    return tikz_template.format(scale=scale, vertices='\n'.join(vertices), edges='\n'.join(edges))
+                style = settings.tikz_classes['edge']
+                if style:
+                    s += "[style={:s}] ".format(style)
+            yield s + "({:d}) to ({:d});".format(source, target)
+
+
+def joined(lines: Iterator[str]) -> Iterator[str]:
+    for index, line in enumerate(lines):
+        yield '\n' + line if index else line
+
+
+def tikz_chunks(graph: BaseGraph | LayoutGraph, scale: float, strip: bool = False) -> Iterator[str]:
+    """Pieces of the TikZ picture of a graph, in order, one line at a time.
+
+    Setting strip as True leaves out the whitespace around the picture."""
+    graph = graph if isinstance(graph, LayoutGraph) else LayoutGraph.from_graph(graph)
+    vertices, rest = tikz_template.split('{vertices}')
+    middle, tail = rest.split('{edges}')
+    head, middle, tail = vertices.format(scale=scale), middle.format(), tail.format()
+    yield head.lstrip() if strip else head
+    yield from joined(chain(vertex_lines(graph), hadamard_lines(graph)))
+    yield middle
+    yield from joined(edge_lines(graph))
+    yield tail.rstrip() if strip else tail
+
+
+def write_tikz(graph: BaseGraph | LayoutGraph, file: TextIO, scale: float, strip: bool = False):
+    """Writes the TikZ picture of a graph to an open file without holding the whole picture in memory."""
+    for chunk in tikz_chunks(graph, scale=scale, strip=strip):
+        file.write(chunk)
+
+
+def to_tikz(graph: BaseGraph | LayoutGraph, scale: float) -> str:
+    return ''.join(tikz_chunks(graph, scale=scale))
@@ -1 +1,2 @@
 from .tableau import Tableau
+from .pauli_table import PauliTable
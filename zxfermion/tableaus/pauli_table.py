@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from zxfermion.gates.gates import Gadget
+from zxfermion.tableaus.tableau import Tableau
+
+WORD_BITS = 64
+
+
+class PauliTable:
+    def __init__(
+            self,
+            x: np.ndarray,
+            z: np.ndarray,
+            phases: np.ndarray,
+            num_qubits: int,
+            variables: Optional[np.ndarray] = None,
+            as_gadget: Optional[np.ndarray] = None,
+            stack: Optional[np.ndarray] = None):
+        assert x.shape == z.shape and x.shape[0] == len(phases)
+        self.x = x
+        self.z = z
+        self.phases = np.asarray(phases, dtype=np.float64)
+        self.num_qubits = num_qubits
+        self.variables = np.full(len(self), None, dtype=object) if variables is None else variables
+        self.as_gadget = np.ones(len(self), dtype=bool) if as_gadget is None else as_gadget
+        self.stack = np.zeros(len(self), dtype=bool) if stack is None else stack
+
+    def __len__(self):
+        return self.x.shape[0]
+
+    def __eq__(self, other):
+        return (
+            self.num_qubits == other.num_qubits
+            and np.array_equal(self.x, other.x)
+            and np.array_equal(self.z, other.z)
+            and np.allclose(self.phases, other.phases))
+
+    @property
+    def num_words(self) -> int:
+        return self.x.shape[1]
+
+    @property
+    def x_bits(self) -> np.ndarray:
+        return unpack_bits(self.x, self.num_qubits)
+
+    @property
+    def z_bits(self) -> np.ndarray:
+        return unpack_bits(self.z, self.num_qubits)
+
+    @property
+    def support(self) -> np.ndarray:
+        return unpack_bits(self.x | self.z, self.num_qubits).astype(bool)
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self.support.sum(axis=1)
+
+    def column(self, qubit: int) -> tuple[np.ndarray, np.ndarray]:
+        word, shift = divmod(qubit, WORD_BITS)
+        return (
+            ((self.x[:, word] >> np.uint64(shift)) & np.uint64(1)).astype(np.uint8),
+            ((self.z[:, word] >> np.uint64(shift)) & np.uint64(1)).astype(np.uint8))
+
+    def set_column(self, qubit: int, x_bits: np.ndarray, z_bits: np.ndarray):
+        word, shift = divmod(qubit, WORD_BITS)
+        mask = np.uint64(1) << np.uint64(shift)
+        self.x[:, word] = (self.x[:, word] & ~mask) | (x_bits.astype(np.uint64) << np.uint64(shift))
+        self.z[:, word] = (self.z[:, word] & ~mask) | (z_bits.astype(np.uint64) << np.uint64(shift))
+
+    def commutation_matrix(self, other: Optional[PauliTable] = None) -> np.ndarray:
+        other = self if other is None else other
+        assert self.num_qubits == other.num_qubits
+        x1, z1 = self.x_bits.astype(np.int64), self.z_bits.astype(np.int64)
+        x2, z2 = other.x_bits.astype(np.int64), other.z_bits.astype(np.int64)
+        return ((x1 @ z2.T + z1 @ x2.T) & 1) == 0
+
+    def commutes_with(self, gadget: Gadget) -> np.ndarray:
+        other = PauliTable.from_gadgets([gadget], num_qubits=self.num_qubits)
+        anticommuting = (self.x & other.z[0]) ^ (self.z & other.x[0])
+        return unpack_bits(anticommuting, self.num_qubits).sum(axis=1) % 2 == 0
+
+    def commutes_with_row(self, row: int, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Whether each of the rows from start to end commutes with the given row of the table."""
+        anticommuting = (self.x[start:end] & self.z[row]) ^ (self.z[start:end] & self.x[row])
+        return word_parity(np.bitwise_xor.reduce(anticommuting, axis=1)) == 0
+
+    def conjugate(self, tableau: Tableau) -> PauliTable:
+        qubits = tableau.qubits
+        assert max(qubits) < self.num_qubits
+        if tableau.lookup is None:
+            return self.conjugate_symplectic(tableau)
+        xs, zs, signs = tableau.lookup
+        columns = [self.column(qubit) for qubit in qubits]
+        index = sum((x_bits.astype(np.intp) | (z_bits.astype(np.intp) << 1)) << (2 * position)
+                    for position, (x_bits, z_bits) in enumerate(columns))
+        table = self.copy()
+        for position, qubit in enumerate(qubits):
+            table.set_column(qubit, xs[index, position], zs[index, position])
+        table.phases = (table.phases * signs[index]) % 2
+        return table
+
+    def conjugate_symplectic(self, tableau: Tableau) -> PauliTable:
+        """Conjugates every row at once by multiplying out the images of the X and Z generators of the tableau.
+
+        The local part of a row is i^|x & z| X^x Z^z, so its image is i^|x & z| times the product of the images of
+        X_j for each x_j and then of Z_j for each z_j. The product is kept as i^e X^a Z^b, and multiplying it by
+        i^f X^c Z^d gives i^(e + f + 2 b.c) X^(a ^ c) Z^(b ^ d). The image is hermitian, so its sign is
+        i^(e - |a & b|)."""
+        qubits = tableau.qubits
+        columns = [self.column(qubit) for qubit in qubits]
+        x = np.array([x_bits for x_bits, _ in columns], dtype=np.int64).T
+        z = np.array([z_bits for _, z_bits in columns], dtype=np.int64).T
+        exponents = (x & z).sum(axis=1)
+        a, b = np.zeros_like(x), np.zeros_like(z)
+        for bits, outputs in ((x, tableau.tableau.x_output), (z, tableau.tableau.z_output)):
+            for position in range(len(qubits)):
+                image = outputs(position)
+                image_x, image_z = (array.astype(np.int64) for array in image.to_numpy())
+                exponent = (0 if image.sign.real > 0 else 2) + int((image_x & image_z).sum())
+                selected = bits[:, position]
+                exponents += selected * (exponent + 2 * (b @ image_x))
+                a ^= selected[:, None] & image_x
+                b ^= selected[:, None] & image_z
+        signs = np.where((exponents - (a & b).sum(axis=1)) % 4 == 0, 1, -1)
+        table = self.copy()
+        for position, qubit in enumerate(qubits):
+            table.set_column(qubit, a[:, position], b[:, position])
+        table.phases = (table.phases * signs) % 2
+        return table
+
+    def copy(self) -> PauliTable:
+        return PauliTable(
+            self.x.copy(), self.z.copy(), self.phases.copy(), self.num_qubits,
+            self.variables.copy(), self.as_gadget.copy(), self.stack.copy())
+
+    def to_gadgets(self) -> list[Gadget]:
+        return [
+            Gadget.from_bits(
+                int.from_bytes(self.x[row].astype('<u8').tobytes(), 'little'),
+                int.from_bytes(self.z[row].astype('<u8').tobytes(), 'little'),
+                phase=float(self.phases[row]),
+                var=self.variables[row],
+                as_gadget=bool(self.as_gadget[row]),
+                stack=bool(self.stack[row]))
+            for row in range(len(self))]
+
+    @classmethod
+    def from_gadgets(cls, gadgets: list[Gadget], num_qubits: Optional[int] = None) -> PauliTable:
+        num_qubits = max([(gadget.x | gadget.z).bit_length() for gadget in gadgets] + [num_qubits or 1])
+        num_words = -(-num_qubits // WORD_BITS)
+        num_bytes = num_words * WORD_BITS // 8
+        x = b''.join(gadget.x.to_bytes(num_bytes, 'little') for gadget in gadgets)
+        z = b''.join(gadget.z.to_bytes(num_bytes, 'little') for gadget in gadgets)
+        return cls(
+            x=np.frombuffer(x, dtype='<u8').astype(np.uint64).reshape(len(gadgets), num_words),
+            z=np.frombuffer(z, dtype='<u8').astype(np.uint64).reshape(len(gadgets), num_words),
+            phases=np.array([gadget.phase for gadget in gadgets], dtype=np.float64),
+            num_qubits=num_qubits,
+            variables=np.array([gadget.var for gadget in gadgets], dtype=object),
+            as_gadget=np.array([bool(gadget.as_gadget) for gadget in gadgets], dtype=bool),
+            stack=np.array([bool(gadget.stack) for gadget in gadgets], dtype=bool))
+
+
+def word_parity(words: np.ndarray) -> np.ndarray:
+    """Parity of the set bits of each uint64."""
+    if hasattr(np, 'bitwise_count'):  # NumPy 2
+        return np.bitwise_count(words) & np.uint8(1)
+    for shift in (32, 16, 8, 4, 2, 1):
+        words = words ^ (words >> np.uint64(shift))
+    return words & np.uint64(1)
+
+
+def unpack_bits(words: np.ndarray, num_qubits: int) -> np.ndarray:
+    bits = np.unpackbits(words.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    return bits[:, :num_qubits]
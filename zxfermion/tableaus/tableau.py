@@ -1,29 +1,104 @@
-from copy import deepcopy
+from __future__ import annotations
 
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
 import stim
 from zxfermion import Gadget
-from zxfermion.types import PauliType, GateType
+from zxfermion.types import GateType
+
+LOCAL_PAULIS = 'IXZY'
+MAX_LOOKUP_QUBITS = 4
+NAMED_GATES = {
+    GateType.X: 'X',
+    GateType.Z: 'Z',
+    GateType.CX: 'CNOT',
+    GateType.CZ: 'CZ',
+    GateType.H: 'H',
+    GateType.X_PLUS: 'SQRT_X',
+    GateType.Z_PLUS: 'SQRT_Z',
+    GateType.X_MINUS: 'SQRT_X_DAG',
+    GateType.Z_MINUS: 'SQRT_Z_DAG',
+}
+
+
+def tableau_lookup(tableau: stim.Tableau) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Local action of a tableau, indexed by sum((x_k | z_k << 1) << 2k) over its qubits."""
+    num_qubits = len(tableau)
+    xs = np.zeros((4 ** num_qubits, num_qubits), dtype=np.uint8)
+    zs = np.zeros((4 ** num_qubits, num_qubits), dtype=np.uint8)
+    signs = np.ones(4 ** num_qubits, dtype=np.int8)
+    for index in range(4 ** num_qubits):
+        local = ''.join(LOCAL_PAULIS[(index >> (2 * position)) & 3] for position in range(num_qubits))
+        result = tableau(stim.PauliString(local))
+        xs[index], zs[index] = result.to_numpy()
+        signs[index] = int(result.sign.real)
+    for array in (xs, zs, signs):
+        array.flags.writeable = False
+    return xs, zs, signs
+
+
+@lru_cache(maxsize=None)
+def named_tableau(gate_type: GateType) -> stim.Tableau:
+    return stim.Tableau.from_named_gate(NAMED_GATES[gate_type])
+
+
+@lru_cache(maxsize=None)
+def named_lookup(gate_type: GateType) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return tableau_lookup(named_tableau(gate_type))
 
 
 class Tableau:
-    def __init__(self, gate):
-        self.gate = gate
-        self.tableau = stim.Tableau.from_named_gate({
-            GateType.X: 'X',
-            GateType.Z: 'Z',
-            GateType.CX: 'CNOT',
-            GateType.CZ: 'CZ',
-            GateType.H: 'H',
-            GateType.X_PLUS: 'SQRT_X',
-            GateType.Z_PLUS: 'SQRT_Z',
-            GateType.X_MINUS: 'SQRT_X_DAG',
-            GateType.Z_MINUS: 'SQRT_Z_DAG',
-        }.get(gate.type))
+    def __init__(self, gate, qubits: Optional[list[int]] = None, lookup: bool = True):
+        """A stim tableau gets a lookup table of its local action if lookup is set and it has at most
+        MAX_LOOKUP_QUBITS qubits. Building the table takes 4^n calls to stim, so it is only worth it for a tableau that
+        conjugates many gadgets."""
+        if isinstance(gate, stim.Tableau):
+            self.gate = None
+            self.tableau = gate
+            self.qubits = list(range(len(gate))) if qubits is None else list(qubits)
+            assert len(self.qubits) == len(gate)
+            self.lookup = tableau_lookup(gate) if lookup and len(gate) <= MAX_LOOKUP_QUBITS else None
+        else:
+            self.gate = gate
+            self.tableau = named_tableau(gate.type)
+            self.qubits = list(gate.qubits)
+            self.lookup = named_lookup(gate.type)
+        self.keep = ~sum(1 << qubit for qubit in self.qubits)
+        self.images = None if self.lookup is None else [
+            (sum(int(bit) << qubit for bit, qubit in zip(x_bits, self.qubits)),
+             sum(int(bit) << qubit for bit, qubit in zip(z_bits, self.qubits)),
+             int(sign))
+            for x_bits, z_bits, sign in zip(*self.lookup)]
+
+    @classmethod
+    def from_gates(cls, gates: list) -> Tableau:
+        assert all(gate.type in NAMED_GATES for gate in gates)
+        qubits = sorted({qubit for gate in gates for qubit in gate.qubits})
+        positions = {qubit: position for position, qubit in enumerate(qubits)}
+        tableau = stim.Tableau(len(qubits))
+        for gate in gates:
+            tableau.append(named_tableau(gate.type), [positions[qubit] for qubit in gate.qubits])
+        return cls(tableau, qubits=qubits)
 
     def __call__(self, gadget: Gadget) -> Gadget:
-        gadget = deepcopy(gadget)
-        qubits = self.gate.qubits
-        stim_result = self.tableau(stim.PauliString([gadget.paulis.get(qubit, 'I') for qubit in qubits]))
-        pauli_string = str(stim_result)[1:].replace('_', 'I')
-        gadget.paulis.update({qubit: PauliType(pauli) for qubit, pauli in zip(qubits, pauli_string)})
-        return Gadget(gadget.pauli_string, stim_result.sign.real * gadget.phase)
+        if self.images is None:
+            return self.conjugate_stim(gadget)
+        index = 0
+        for position, qubit in enumerate(self.qubits):
+            index |= ((gadget.x >> qubit & 1) | (gadget.z >> qubit & 1) << 1) << (2 * position)
+        x, z, sign = self.images[index]
+        return Gadget.from_bits(
+            (gadget.x & self.keep) | x, (gadget.z & self.keep) | z, sign * gadget.phase,
+            var=gadget.var, as_gadget=gadget.as_gadget, stack=gadget.stack)
+
+    def conjugate_stim(self, gadget: Gadget) -> Gadget:
+        stim_result = self.tableau(stim.PauliString(''.join(gadget.pauli(qubit) for qubit in self.qubits)))
+        x, z = gadget.x & self.keep, gadget.z & self.keep
+        for qubit, (x_bit, z_bit) in zip(self.qubits, zip(*stim_result.to_numpy())):
+            x |= int(x_bit) << qubit
+            z |= int(z_bit) << qubit
+        return Gadget.from_bits(
+            x, z, stim_result.sign.real * gadget.phase,
+            var=gadget.var, as_gadget=gadget.as_gadget, stack=gadget.stack)
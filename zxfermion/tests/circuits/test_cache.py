@@ -0,0 +1,80 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from zxfermion import Gadget
+from zxfermion.cache import ArtefactCache
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.gates.gates import CX
+from zxfermion.utils import settings
+from zxfermion.tests.graphs.fixtures import latex_engine
+
+
+@pytest.fixture
+def cache_directory(tmp_path, monkeypatch) -> Path:
+    shutil.copytree(Path(__file__).parents[3] / 'tikz', tmp_path / 'tikz', dirs_exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, 'cache_directory', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+def unrenderable(circuit: GadgetCircuit) -> GadgetCircuit:
+    def cached_graph(*args, **kwargs):
+        raise AssertionError('artefact was rendered again')
+    circuit.cached_graph = cached_graph
+    return circuit
+
+
+def test_cache_key(monkeypatch):
+    circuit = GadgetCircuit([Gadget('XZ', 1/4), CX(0, 1)])
+    key = ArtefactCache.key(circuit, '.tikz', scale=0.5)
+    assert key == ArtefactCache.key(GadgetCircuit([Gadget('XZ', 1/4), CX(0, 1)]), '.tikz', scale=0.5)
+    assert key != ArtefactCache.key(circuit, '.svg', scale=0.5)
+    assert key != ArtefactCache.key(circuit, '.tikz', scale=1)
+    assert key != ArtefactCache.key(GadgetCircuit([Gadget('XZ', 1/4, var='theta'), CX(0, 1)]), '.tikz', scale=0.5)
+    assert key != ArtefactCache.key(GadgetCircuit([Gadget('XZ', 1/4), CX(0, 1, as_gadget=True)]), '.tikz', scale=0.5)
+    monkeypatch.setattr(settings, 'tikz_var', r'\theta')
+    assert key != ArtefactCache.key(circuit, '.tikz', scale=0.5)
+    monkeypatch.setattr(settings, 'cache_max_bytes', 1)
+    monkeypatch.setattr(settings, 'tikz_var', r'\pi')
+    assert key == ArtefactCache.key(circuit, '.tikz', scale=0.5)
+
+
+def test_cached_exports(cache_directory):
+    circuit = GadgetCircuit([Gadget('XZ', 1/4), CX(0, 1)])
+    tikz, svg = circuit.tikz(), circuit.svg(scale=10)
+    circuit.tikz(name='circuit')
+    circuit.tex(name='circuit')
+    assert len(os.listdir(cache_directory)) == 3  # tikz() and tikz(name=...) share an artefact
+    cached = unrenderable(GadgetCircuit([Gadget('XZ', 1/4), CX(0, 1)]))
+    assert cached.tikz() == tikz
+    assert cached.svg(scale=10) == svg
+    Path('output/circuit.tikz').unlink()
+    cached.tikz(name='circuit')
+    assert Path('output/circuit.tikz').read_text() == tikz
+    cached.tex(name='copy')
+    assert Path('output/copy_temp.tex').read_text() == Path('output/circuit_temp.tex').read_text()
+    with pytest.raises(AssertionError):
+        cached.tikz(scale=1)
+
+
+def test_cached_pdf(cache_directory, latex_engine):
+    GadgetCircuit([Gadget('XZ', 1/4)]).pdf(name='circuit', engine=str(latex_engine))
+    unrenderable(GadgetCircuit([Gadget('XZ', 1/4)])).pdf(name='copy', engine=str(latex_engine))
+    assert Path('output/copy.pdf').read_bytes() == Path('output/circuit.pdf').read_bytes()
+
+
+def test_cache_eviction(tmp_path):
+    cache = ArtefactCache(tmp_path, max_bytes=10)
+    for time, key in enumerate(['a', 'b']):
+        cache.save(key, '.txt', '1234')
+        os.utime(cache.path(key, '.txt'), (time, time))
+    assert cache.load('a', '.txt') == '1234'
+    cache.save('c', '.txt', '1234')
+    assert sorted(os.listdir(tmp_path)) == ['a.txt', 'c.txt']
+    assert cache.size() == 8
+    assert not cache.fetch('b', '.txt', tmp_path / 'b_copy.txt')
+    cache.clear()
+    assert cache.size() == 0
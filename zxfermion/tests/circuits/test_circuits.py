@@ -1,7 +1,10 @@
 import pytest
+from copy import deepcopy
 from zxfermion.types import GateType
 from zxfermion import Gadget
-from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.circuits.circuits import GadgetCircuit, GateList
+from zxfermion.gates import CX, CZ, H, X, Z, XPlus, XMinus, ZPlus, XPhase, ZPhase
+from zxfermion.tableaus.tableau import Tableau
 
 
 # test num_qubits > max(gadget.num_qubits...) vs num_qubits < max(gadget.num_qubits...)
@@ -31,6 +34,103 @@ def test_add_circuits():
     assert len(circuit.gates) == 2
 
 
+def test_add_circuits_merges_gadgets():
+    circuit1 = GadgetCircuit([Gadget('XYZ', 1/4), Gadget('ZZI', 1/2)])
+    circuit2 = GadgetCircuit([Gadget('XYZ', 1/4), Gadget('ZZZ', 3/2)])
+    circuit = circuit1 + circuit2
+    assert circuit.gates == [Gadget('XYZ', 1/2), Gadget('ZZI', 1/2), Gadget('ZZZ', 3/2)]
+
+
+# @formatter:off
+@pytest.mark.parametrize(['gates', 'expected'], [
+    [[Gadget('XX', 1/4), Gadget('ZZ', 1/4), Gadget('XX', 1/4)],  [Gadget('XX', 1/2), Gadget('ZZ', 1/4)]],
+    [[Gadget('XX', 1/4), Gadget('ZI', 1/4), Gadget('XX', 1/4)],  [Gadget('XX', 1/4), Gadget('ZI', 1/4), Gadget('XX', 1/4)]],
+    [[Gadget('XX', 1/4), Gadget('IIZ', 1/4), Gadget('XX', 7/4)], [Gadget('IIZ', 1/4)]],
+    [[Gadget('XX', 1/4), CX(0, 1), Gadget('XX', 1/4)],           [Gadget('XX', 1/4), CX(0, 1), Gadget('XX', 1/4)]],
+    [[Gadget('XX', 1/4), H(2), Gadget('XX', 1/4)],               [Gadget('XX', 1/2), H(2)]],
+    [[Gadget('Z', 1), Gadget('Z', 1), Gadget('Z', 1)],           [Gadget('Z', 1)]],
+])  # @formatter:on
+def test_simplify(gates, expected):
+    circuit = GadgetCircuit(gates, num_qubits=3)
+    assert circuit.simplify() == expected
+
+
+def test_simplify_keeps_options():
+    gates = [Gadget('XX', 1/4, var='theta', as_gadget=False, stack=True), Gadget('ZZ', 1/4), Gadget('XX', 1/4)]
+    merged = GadgetCircuit(gates).simplify()[0]
+    assert merged == Gadget('XX', 1/2)
+    assert (merged.var, merged.as_gadget, merged.stack) == (r'\theta', False, True)
+
+
+def test_simplify_long_circuit():
+    strings = [format(number, '030b').replace('0', 'I').replace('1', 'Z') for number in range(1, 1001)]
+    gates = [gate for string in strings for gate in [Gadget('Z' * 30, 1/1024), Gadget(string, 1/4)]]
+    expected = [Gadget('Z' * 30, 1000/1024), *[Gadget(string, 1/4) for string in strings]]
+    assert GadgetCircuit(gates).simplify() == expected
+
+
+def test_simplify_trotter_circuit():
+    strings = [format(number, '012b').replace('0', 'I').replace('1', 'Z') for number in range(1, 301)]
+    gates = [Gadget(string, 1/64) for _ in range(20) for string in strings]
+    assert GadgetCircuit(gates).simplify() == [Gadget(string, 20/64) for string in strings]
+    steps = [Gadget('ZZ', 1/4), Gadget('IZ', 1/4), Gadget('X', 1/4)]
+    assert GadgetCircuit(steps * 2).simplify() == [steps[0], Gadget('IZ', 1/2), steps[2], steps[0], steps[2]]
+
+
+# @formatter:off
+@pytest.mark.parametrize(['gates', 'expected'], [
+    [[H(0), H(0), X(1)],                                    [X(1)]],
+    [[X(0), XPlus(0), CX(0, 1), CX(0, 1), X(0)],            [XPlus(0)]],
+    [[CX(0, 1), H(1), H(1), CX(0, 1), Z(2)],                [Z(2)]],
+    [[CZ(0, 1), CZ(1, 0), ZPhase(0, 1/4), ZPhase(0, 1/2)],  [ZPhase(0, 3/4)]],
+    [[CX(0, 1), CX(1, 0)],                                  [CX(0, 1), CX(1, 0)]],
+    [[XPlus(0), H(0), XMinus(0)],                           [XPlus(0), H(0), XMinus(0)]],
+    [[ZPlus(1), CX(0, 1), ZPlus(1)],                        [ZPlus(1), CX(0, 1), ZPlus(1)]],
+    [[Gadget('XYZ', 1/4), Gadget('XYZ', 7/4), H(2)],        [H(2)]],
+])  # @formatter:on
+def test_peephole(gates, expected):
+    circuit = GadgetCircuit(gates, num_qubits=3)
+    assert circuit.peephole() == expected
+
+
+def test_peephole_keeps_options():
+    gates = [Gadget('XYZ', 1/4, var='theta', as_gadget=False, stack=True), Gadget('XYZ', 1/4)]
+    fused = GadgetCircuit(gates).peephole()[0]
+    assert fused == Gadget('XYZ', 1/2)
+    assert (fused.var, fused.as_gadget, fused.stack) == (r'\theta', False, True)
+
+
+def test_schedule():
+    gates = [Gadget('XX', 1/4), Gadget('ZI', 1/4), Gadget('ZZ', 1/4), Gadget('IIX', 1/4), Gadget('YY', 1/4)]
+    circuit, boundaries = GadgetCircuit(gates).schedule()
+    assert boundaries == [0, 3, 4, 5]
+    assert circuit.gates == [gates[0], gates[2], gates[3], gates[1], gates[4]]
+
+    circuit, boundaries = GadgetCircuit(gates).schedule(disjoint=True)
+    assert boundaries == [0, 2, 3, 4, 5]
+    assert circuit.gates == [gates[0], gates[3], gates[1], gates[2], gates[4]]
+
+
+@pytest.mark.parametrize('disjoint', [False, True])
+def test_schedule_layers(disjoint):
+    from zxfermion.other.operators import operators
+    gates = [
+        Gadget(gate.pauli_string, gate.phase, var=str(index))
+        for index, gate in enumerate(gate for operator in operators for gate in operator.gates)]
+    circuit, boundaries = GadgetCircuit(gates).schedule(disjoint=disjoint)
+    assert sorted(map(repr, circuit.gates)) == sorted(map(repr, gates))
+    for start, end in zip(boundaries, boundaries[1:]):
+        layer = circuit.gates[start:end]
+        assert all(gadget1.commutes(gadget2) for gadget1 in layer for gadget2 in layer)
+        if disjoint:
+            assert sum(len(gadget.qubits) for gadget in layer) == len({q for gadget in layer for q in gadget.qubits})
+    position = {gadget.var: index for index, gadget in enumerate(circuit.gates)}
+    for index, gadget1 in enumerate(gates):
+        for gadget2 in gates[index + 1:]:
+            if not gadget1.commutes(gadget2):
+                assert position[gadget1.var] < position[gadget2.var]
+
+
 def test_add_incompatible_circuits():
     circuit1 = GadgetCircuit([Gadget(pauli_string='XYZ')])
     circuit2 = GadgetCircuit([Gadget(pauli_string='IZYX')])
@@ -38,6 +138,120 @@ def test_add_incompatible_circuits():
         circuit1 + circuit2
 
 
+@pytest.mark.parametrize('gate', [CX(0, 3), CX(2, 1), CZ(0, 2), H(1), XPlus(3)])
+def test_apply(gate):
+    gates = [Gadget('YXXX', 1/4), ZPhase(0, 1/2), Gadget('XYXX', 1/4), Gadget('XXYX', 7/4), Gadget('IYIZ', 1/2)]
+    circuit = GadgetCircuit(gates)
+    circuit.apply(gate, start=1, end=4)
+    tableau = Tableau(gate)
+    assert circuit.gates[0] == gates[0]
+    assert circuit.gates[1] == gate
+    assert circuit.gates[2] == gates[1]
+    assert circuit.gates[3:5] == [tableau(gates[2]), tableau(gates[3])]
+    assert circuit.gates[5] == gate.inverse
+    assert circuit.gates[6] == gates[4]
+
+
+@pytest.mark.parametrize('cliffords', [
+    [CX(0, 3), CX(0, 2), CX(0, 1)],
+    [H(0), CZ(1, 3), XPlus(2), CX(2, 0)],
+    GadgetCircuit([CX(3, 2), H(1), CX(1, 0)])])
+def test_apply_cliffords(cliffords):
+    gates = [Gadget('YXXX', 1/4), Gadget('XYXX', 1/4), Gadget('XXYX', 7/4), Gadget('YYYX', 7/4)]
+    composed = GadgetCircuit(gates)
+    composed.apply(cliffords)
+    sequential = GadgetCircuit(gates)
+    for clifford in (cliffords.gates if isinstance(cliffords, GadgetCircuit) else cliffords):
+        sequential.apply(clifford)
+    assert composed.gates == sequential.gates
+
+
+def test_apply_empty():
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1)])
+    circuit.apply([])
+    assert circuit.gates == [Gadget('XYZ', 1/4), CX(0, 1)]
+
+
+def layout(graph) -> tuple:
+    position = {vertex: (graph.qubit(vertex), graph.row(vertex)) for vertex in graph.vertices()}
+    return (
+        sorted((position[vertex], graph.type(vertex), graph.phase(vertex)) for vertex in graph.vertices()),
+        sorted(sorted((position[source], position[target])) for source, target in graph.edges()))
+
+
+@pytest.mark.parametrize('start, end', [(0, 0), (0, 2), (1, 4), (2, 5), (5, 5)])
+@pytest.mark.parametrize('cliffords', [CX(0, 3), H(1), [CZ(0, 2), XPlus(3)]])
+def test_apply_graph(start, end, cliffords):
+    gates = [Gadget('YXXX', 1/4), ZPhase(0, 1/2), CX(1, 2, as_gadget=True), Gadget('XXYX', 7/4), Gadget('IYIZ', 1/2)]
+    circuit = GadgetCircuit(gates)
+    graph = circuit.persistent_graph()
+    vertices = circuit.builder.spans[0]
+    circuit.apply(cliffords, start=start, end=end)
+    circuit.apply(CX(3, 1), start=start, end=end + 2)
+    assert circuit.persistent_graph() is graph
+    assert layout(graph) == layout(circuit.graph(stack=False))
+    assert (circuit.builder.spans[0] == vertices) == (start > 0)
+
+
+def test_persistent_graph_rebuilt():
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1)])
+    graph = circuit.persistent_graph()
+    circuit.gates.append(H(2))
+    circuit.apply(CX(0, 2))
+    assert circuit.persistent_graph() is not graph
+    assert layout(circuit.persistent_graph()) == layout(circuit.graph(stack=False))
+
+
+def test_circuit_version():
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1)])
+    assert circuit.version == 0
+    circuit.apply(H(0))
+    assert circuit.version == 1
+    circuit.gates.append(Gadget('ZZ', 1/2))
+    circuit.gates[0] = X(0)
+    del circuit.gates[-1]
+    assert circuit.version == 4
+    circuit.gates = [Gadget('XYZ', 1/4)]
+    assert isinstance(circuit.gates, GateList)
+    assert circuit.version == 5
+    assert deepcopy(circuit).gates == circuit.gates
+
+
+def test_cached_graph():
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1), Gadget('IZZ', 1/2)])
+    graph = circuit.cached_graph()
+    assert circuit.cached_graph() is graph
+    assert circuit.tikz() == graph.tikz()
+    assert circuit.cached_graph(as_gadgets=False) is not graph
+    assert len(circuit.graphs) == 2
+    assert deepcopy(circuit).graphs == {}
+
+    circuit.apply(CX(1, 2), start=1)
+    assert circuit.cached_graph() is not graph
+    assert len(circuit.graphs) == 1
+    assert circuit.tikz() == circuit.graph().tikz()
+
+
+def test_extract_cliffords():
+    cx, h, x_plus, z = CX(0, 2), H(1), XPlus(2), X(0)
+    gadget1, gadget2, gadget3 = Gadget('XYZ', 1/4), Gadget('ZZX', 1/3), Gadget('YIY', 3/2)
+    circuit = GadgetCircuit([gadget1, cx, h, gadget2, XPhase(1, 1/8), x_plus, z, gadget3, CZ(0, 1)])
+    gadgets, tableau = circuit.extract_cliffords()
+
+    def pull(gadget, cliffords):
+        for clifford in reversed(cliffords):
+            gadget = Tableau(clifford.inverse)(gadget)
+        return gadget
+
+    assert gadgets == [
+        gadget1,
+        pull(gadget2, [cx, h]),
+        pull(Gadget('IX', 1/8), [cx, h]),
+        pull(gadget3, [cx, h, x_plus, z])]
+    assert tableau.tableau == Tableau.from_gates([cx, h, x_plus, z, CZ(0, 1)]).tableau
+    assert all(gadget.type == GateType.GADGET for gadget in gadgets)
+
+
 def test_stack_gates():
     pass
 
@@ -52,3 +266,30 @@ def test_circuit_tikz():
 
 def test_circuit_matrix():
     pass
+
+
+def test_circuit_dict():
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1), CZ(2, 0), H(1), XPlus(2), ZPhase(0, 3/4), X(1)])
+    assert GadgetCircuit.from_dict(circuit.to_dict()).gates == circuit.gates
+
+
+@pytest.mark.parametrize('stack', [False, True])
+def test_circuit_pages(stack):
+    gates = [Gadget('XYZ', 1/4), CX(0, 1), Gadget('ZZ', 1/2), H(2), Gadget('IXX', 3/2), ZPhase(0, 1/4), CZ(1, 2)]
+    circuit = GadgetCircuit(gates)
+    pages = list(circuit.pages(gates_per_page=3, stack=stack))
+    assert len(pages) == 3
+    for page, start in zip(pages, [0, 3, 6]):
+        assert page.tikz() == GadgetCircuit(gates[start:start + 3], num_qubits=3).layout_graph(stack=stack).tikz()
+    for page in circuit.pages(rows_per_page=6, stack=stack):
+        assert page.rows.max() - page.rows.min() - 1 <= 6
+        assert page.num_qubits == 3 and len(page.inputs) == len(page.outputs) == 3
+    assert len(list(circuit.pages(rows_per_page=1, stack=stack))) == (6 if stack else 7)  # ZPhase(0) stacks by CZ(1, 2)
+
+
+def test_circuit_export_pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    circuit = GadgetCircuit([Gadget('XYZ', 1/4), CX(0, 1), Gadget('ZZ', 1/2)])
+    paths = circuit.export_pages('circuit', format='svg', gates_per_page=2)
+    assert [str(path) for path in paths] == ['output/circuit_000.svg', 'output/circuit_001.svg']
+    assert paths[1].read_text() == GadgetCircuit([Gadget('ZZ', 1/2)], num_qubits=3).svg()
@@ -0,0 +1,59 @@
+import math
+from functools import reduce
+
+import numpy as np
+import pytest
+
+from zxfermion import Gadget
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.gates import CX, CZ, H, X, Z, XPlus, XMinus, ZPlus, ZMinus, XPhase, ZPhase
+
+PAULIS = {
+    'I': np.eye(2), 'X': np.array([[0, 1], [1, 0]]), 'Y': np.array([[0, -1j], [1j, 0]]), 'Z': np.diag([1, -1])}
+
+
+def gadget_unitary(pauli_string: str, phase: float) -> np.ndarray:
+    angle = math.pi * phase / 2
+    pauli = reduce(np.kron, [PAULIS[pauli] for pauli in pauli_string])
+    return math.cos(angle) * np.eye(len(pauli)) - 1j * math.sin(angle) * pauli
+
+
+def equal_up_to_phase(first: np.ndarray, second: np.ndarray) -> bool:
+    return math.isclose(abs(np.vdot(first, second)), np.linalg.norm(first) * np.linalg.norm(second), rel_tol=1e-9)
+
+
+@pytest.mark.parametrize('pauli_string', ['X', 'Y', 'Z', 'XY', 'YZX', 'ZIZ', 'IYIX', 'XXYY'])
+@pytest.mark.parametrize('phase', [0.25, 0.5, 1.5, 0.3])
+def test_statevector_gadget(pauli_string, phase):
+    num_qubits = len(pauli_string)
+    state = np.random.default_rng(0).normal(size=(2 ** num_qubits, 2)) @ [1, 1j]
+    circuit = GadgetCircuit([Gadget(pauli_string, phase)], num_qubits=num_qubits)
+    assert np.allclose(circuit.statevector(state), gadget_unitary(pauli_string, phase) @ state)
+
+
+def test_statevector_matches_graph():
+    gates = [
+        Gadget('XYZ', 1/4), CX(0, 2), CX(2, 1), CZ(1, 2), H(0), XPlus(1), XMinus(2), ZPlus(0), ZMinus(1),
+        X(2), Z(0), XPhase(1, 0.3), ZPhase(2, 0.7), Gadget('IZY', 3/2), CZ(0, 1)]
+    circuit = GadgetCircuit(gates)
+    matrix = circuit.graph().to_matrix()
+    for index in range(8):
+        assert equal_up_to_phase(circuit.statevector(index), matrix[:, index])
+
+
+def test_statevector_initial_state():
+    circuit = GadgetCircuit([X(0), CX(0, 1)], num_qubits=3)
+    assert circuit.statevector()[0b110] == pytest.approx(1)
+    assert circuit.statevector('110')[0b010] == pytest.approx(1)
+    assert circuit.statevector(0b001)[0b111] == pytest.approx(1)
+    assert circuit.statevector(np.ones(8) / math.sqrt(8)) == pytest.approx(np.ones(8) / math.sqrt(8))
+    assert circuit.statevector(dtype=np.complex64).dtype == np.complex64
+
+
+def test_statevector_large():
+    num_qubits = 16
+    circuit = GadgetCircuit([Gadget('Z' * num_qubits, 1/4), Gadget('X' * num_qubits, 1/2)], num_qubits=num_qubits)
+    state = circuit.statevector()
+    assert np.count_nonzero(np.abs(state) > 1e-12) == 2
+    assert state[0] == pytest.approx(np.exp(-1j * math.pi / 8) / math.sqrt(2))
+    assert state[-1] == pytest.approx(-1j * np.exp(-1j * math.pi / 8) / math.sqrt(2))
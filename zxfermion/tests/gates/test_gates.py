@@ -88,6 +88,27 @@ def test_gadget_pauli_string(pauli_string, paulis):
     assert max(gadget.paulis) == 2
 
 
+# @formatter:off
+@pytest.mark.parametrize(['pauli_string', 'x', 'z'],
+[['XYZ', 0b011, 0b110], ['ZIZ', 0b000, 0b101], ['IIX', 0b100, 0b000], ['YII', 0b001, 0b001]])  # @formatter:on
+def test_gadget_bits(pauli_string, x, z):
+    gadget = Gadget(pauli_string, phase=1/2)
+    assert (gadget.x, gadget.z) == (x, z)
+    assert gadget.pauli_string == pauli_string.rstrip('I')
+    assert Gadget.from_bits(x, z, phase=1/2) == gadget
+    assert not hasattr(gadget, '__dict__')
+    with pytest.raises(ValueError):
+        Gadget('XAZ')
+
+
+# @formatter:off
+@pytest.mark.parametrize(['pauli_string1', 'pauli_string2', 'commutes'],
+[['XYZ', 'XYZ', True], ['XII', 'ZII', False], ['XX', 'ZZ', True], ['XYZ', 'ZYX', True], ['IYZX', 'ZZZ', False]])  # @formatter:on
+def test_gadget_commutes(pauli_string1, pauli_string2, commutes):
+    assert Gadget(pauli_string1).commutes(Gadget(pauli_string2)) == commutes
+    assert Gadget(pauli_string2).commutes(Gadget(pauli_string1)) == commutes
+
+
 # @formatter:off
 @pytest.mark.parametrize(['phase', 'expected'],
 [[None, 0], [0, 0], [1, 1], [2, 0], [3, 1], [1/4, 1/4], [3/2, 3/2], [5.5, 1.5], [12/5, 2/5]])  # @formatter:on
@@ -1,9 +1,47 @@
+import shutil
+import sys
+from pathlib import Path
+
 import pytest
 from pyzx import VertexType
 
 from zxfermion import BaseGraph
 
 
+FAKE_LATEX = f"""#!{sys.executable}
+import sys
+from pathlib import Path
+
+directory = next(arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('-output-directory='))
+tex = Path(sys.argv[-1])
+with open(__file__ + '.log', 'a') as log:
+    log.write(tex.name + '\\n')
+if 'FAIL' in tex.read_text():
+    sys.exit(1)
+pictures = tex.read_text().count(r'\\begin{{tikzpicture}}')
+if pictures > 1:
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for _ in range(pictures):
+        writer.add_blank_page(width=72, height=72)
+    writer.write(Path(directory) / (tex.stem + '.pdf'))
+else:
+    (Path(directory) / (tex.stem + '.pdf')).write_text(tex.read_text())
+"""
+
+
+@pytest.fixture
+def latex_engine(tmp_path, monkeypatch) -> Path:
+    """Stand-in for pdflatex, run from a copy of the repository's tikz directory. Logs each document it compiles
+    to the file with .log appended to its path, and writes the document itself as the PDF of a single picture."""
+    shutil.copytree(Path(__file__).parents[3] / 'tikz', tmp_path / 'tikz', dirs_exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    engine = tmp_path / 'fake_latex'
+    engine.write_text(FAKE_LATEX)
+    engine.chmod(0o755)
+    return engine
+
+
 @pytest.fixture
 def additional_padding():
     return 1
@@ -1,10 +1,19 @@
+import io
+from contextlib import nullcontext
+from pathlib import Path
+
 import pytest
 
+from zxfermion import Gadget
+from zxfermion.gates.gates import CX
 from zxfermion.graphs.base_graph import BaseGraph
 from zxfermion.graphs.gadget_graph import GadgetGraph
+from zxfermion.graphs.layout_graph import LayoutGraph
+from zxfermion.graphs.tikz import to_tikz, write_tikz
+from zxfermion.utils import settings
 from .fixtures import (
     zzz, yzx, izzzi, zzz_padded, additional_padding,
-    zzz_expanded, izzzi_expanded, zzz_expanded_unstacked,
+    zzz_expanded, izzzi_expanded, zzz_expanded_unstacked, latex_engine,
 )
 
 
@@ -484,9 +493,168 @@ def test20_base_graph_compose():
     pass
 
 
-def test21_base_graph_tikz():
-    pass
-
-
-def test22_base_graph_pdf():
-    pass
+def test20_base_graph_compose_reads_other():
+    other = Gadget('XYZ', 1/4, var='theta').graph
+    data = other.rows().copy(), other.qubits().copy(), list(other.edges())
+    graph = GadgetGraph(num_qubits=3)
+    graph.compose(other)
+    graph.compose(other)
+    assert (other.rows(), other.qubits(), list(other.edges())) == data
+    assert graph.num_vertices() == 6 + 2 * (other.num_vertices() - 6)
+
+
+def test20_base_graph_compose_consume():
+    gadget = Gadget('XYZ', 1/4, var='theta')
+    graph1, graph2 = GadgetGraph(num_qubits=3), GadgetGraph(num_qubits=3)
+    graph1.compose(gadget.graph)
+    other = gadget.graph
+    offset = max(graph2.vertices()) + 1
+    moved = {vertex + offset for vertex in other.vertices() if vertex not in other.boundary_set}
+    graph2.compose(other, consume=True)
+    assert graph1 == graph2
+    assert moved == set(graph2.vertices()) - set(graph2.boundaries)
+    assert [graph2.vdata(vertex, 'var', None) for vertex in graph2.vertices()] == \
+        [graph1.vdata(vertex, 'var', None) for vertex in graph1.vertices()]
+    assert other.num_vertices() == 6 and not other.bounded_vertices and other.num_edges() == 3
+    assert all(not other.vdata_keys(vertex) for vertex in other.vertices())
+    phase = next(vertex for vertex in graph2.vertices() if graph2.vdata(vertex, 'var', None))
+    graph2.set_vdata(phase, 'var', 'phi')
+    assert all(other.vdata(vertex, 'var', None) is None for vertex in other.vertices())
+    assert graph1 != graph2
+
+
+def test20_base_graph_iadd():
+    graph = GadgetGraph(num_qubits=3)
+    expected = graph + Gadget('XYZ', 1/4).graph + Gadget('ZZ', 1/2).graph
+    same = graph
+    graph += Gadget('XYZ', 1/4).graph
+    graph += Gadget('ZZ', 1/2).graph
+    assert graph is same
+    assert graph == expected
+    graph += graph
+    assert graph.num_vertices() == 6 + 2 * (expected.num_vertices() - 6)
+
+
+def test21_base_graph_tikz(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    graph = GadgetGraph(num_qubits=3)
+    graph.compose(Gadget('XYZ', 1/4, var='theta').graph)
+    buffer = io.StringIO()
+    write_tikz(graph, buffer, scale=0.5)
+    assert buffer.getvalue() == graph.tikz() == to_tikz(LayoutGraph.from_graph(graph), scale=0.5)
+    assert r'\frac{\theta}{4}' in graph.tikz()
+    graph.tikz(name='xyz')
+    assert (tmp_path / 'output' / 'xyz.tikz').read_text() == graph.tikz()
+
+
+def test22_base_graph_pdf(latex_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'cache_directory', tmp_path / 'cache')
+    graph = GadgetGraph(num_qubits=3)
+    graph.compose(Gadget('XYZ', 1/4).graph)
+    graph.pdf(name='xyz', engine=str(latex_engine))
+    assert Path('output/xyz.pdf').read_text() == Path('tikz/template.tex').read_text().replace(
+        'TIKZ_PICTURE', graph.tikz().strip())
+    assert not Path('output/xyz_temp.tex').exists()
+    graph.pdf(name='xyz_again', engine=str(latex_engine))
+    assert Path('output/xyz_again.pdf').read_text() == Path('output/xyz.pdf').read_text()
+    assert Path(f'{latex_engine}.log').read_text().splitlines() == ['xyz_temp.tex']
+
+
+def test23_base_graph_fingerprint():
+    graph = GadgetGraph(num_qubits=3)
+    graph.compose(Gadget('XYZ', 1/4, var='theta').graph)
+    renumbered = GadgetGraph(num_qubits=3)
+    extra = renumbered.add_vertex(0)
+    renumbered.compose(Gadget('XYZ', 1/4, var='theta').graph)
+    renumbered.remove_vertex(extra)
+    assert set(graph.vertices()) != set(renumbered.vertices())
+    assert graph == renumbered
+    assert hash(graph) == hash(renumbered)
+    assert len({graph, renumbered}) == 1
+
+    changed = Gadget('XYZ', 1/4, var='phi').graph
+    assert changed != graph
+    changed = Gadget('XYZ', 1/4, var='theta').graph
+    changed.set_row(next(iter(changed.bounded_vertices)), 0.5)
+    assert changed != graph
+    changed = Gadget('XYZ', 1/4, var='theta').graph
+    source, target = next(iter(changed.edges()))
+    changed.set_edge_type((source, target), 2)
+    assert changed != graph
+    assert graph != BaseGraph(num_qubits=3)
+
+
+def test23_base_graph_fingerprint_cached():
+    graph = Gadget('XYZ', 1/4).graph
+    fingerprint = graph.fingerprint()
+    assert graph.cached_fingerprint == (graph.mutations, fingerprint)
+    vertex = next(iter(graph.bounded_vertices))
+    for change in [
+            lambda: graph.set_phase(vertex, 1/2), lambda: graph.set_type(vertex, 2),
+            lambda: graph.set_vdata(vertex, 'var', r'\theta'), lambda: graph.set_qubit(vertex, 5),
+            lambda: graph.shift_rows(1), lambda: graph.remove_vertex(vertex)]:
+        change()
+        assert graph.fingerprint() != fingerprint
+        fingerprint = graph.fingerprint()
+        graph.cached_fingerprint = None
+        assert graph.fingerprint() == fingerprint
+
+
+def test24_base_graph_qubit_index(zzz_expanded):
+    graph = zzz_expanded
+    graph.set_qubit(graph.vertices_on_qubit(0)[0], 2)
+    graph.set_row(graph.vertices_on_qubit(1)[-1], 0.5)
+    graph.remove_vertex(graph.vertices_on_qubit(2)[0])
+    graph.set_num_qubits(5)
+    graph.add_vertex(qubit=-1, row=-5)
+    graph.add_vertex(qubit=graph.num_qubits, row=100)
+    graph.set_left_padding(2)
+    for qubit in range(graph.num_qubits):
+        vertices = [vertex for vertex in graph.bounded_vertices if graph.qubit(vertex) == qubit]
+        assert graph.vertices_on_qubit(qubit) == sorted(vertices, key=lambda vertex: graph.row(vertex))
+    assert graph.min_qubit == min(graph.qubit(vertex) for vertex in graph.bounded_vertices)
+    assert graph.max_qubit == max(graph.qubit(vertex) for vertex in graph.bounded_vertices)
+    assert graph.left_row == min(graph.row(vertex) for vertex in graph.bounded_vertices)
+    assert graph.right_row == max(graph.row(vertex) for vertex in graph.bounded_vertices)
+
+
+def test24_base_graph_left_padding_row_types(zzz_expanded):
+    graph = zzz_expanded
+    graph.set_left_padding()
+    assert {type(graph.row(vertex)) for vertex in graph.vertices()} == {int}
+    graph.set_left_padding(1.0)
+    assert {type(graph.row(vertex)) for vertex in graph.outputs() + graph.bounded_vertices} == {float}
+
+
+def test25_base_graph_deferred_layout():
+    gadgets = [Gadget('XYZ', 1/4), Gadget('IZZ', 1/2), Gadget('ZIX', 3/2)]
+    graph = GadgetGraph(num_qubits=3)
+    for gadget in gadgets:
+        graph.add_gadget(gadget)
+    deferred = GadgetGraph(num_qubits=3)
+    with deferred.deferred_layout():
+        for gadget in gadgets:
+            deferred.add_gadget(gadget)
+        with deferred.deferred_layout():
+            deferred.set_right_padding(2)
+        assert deferred.output_row == 2
+    graph.set_right_padding(2)
+    assert deferred == graph
+    assert deferred.right_padding == 2
+    assert deferred.left_padding == 1
+
+
+def test25_base_graph_deferred_layout_matches_immediate(monkeypatch):
+    def build():
+        graph = GadgetGraph(num_qubits=2)
+        with graph.deferred_layout():
+            graph.add_expanded_gadget(Gadget('XYZ', 1/4))
+            graph.add_gadget(Gadget('IZZZ', 1/2))
+            graph.add_cx(CX(0, 3), stack=True)
+            if graph.deferred:
+                assert (graph.input_row, graph.output_row) == (0, 2)
+            graph.set_right_padding(2)
+        return graph
+    deferred = build()
+    monkeypatch.setattr(BaseGraph, 'deferred_layout', lambda self: nullcontext(self))
+    assert build() == deferred
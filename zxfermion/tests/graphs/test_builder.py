@@ -0,0 +1,103 @@
+from copy import deepcopy
+
+import pytest
+
+from zxfermion import Gadget
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.gates.gates import XPlus, ZMinus, H, CX, CZ
+from zxfermion.gates import XPhase, ZPhase
+from zxfermion.graphs.builder import gate_template, template_key
+from zxfermion.graphs.gadget_graph import GadgetGraph
+from zxfermion.other.operators import operators
+from zxfermion.types import GateType
+
+gates = [
+    Gadget('XYZ', 1/4, var='theta'), CX(0, 2), ZPhase(1, 1/2), Gadget('IZIZ', 3/2), CZ(3, 1), XPlus(3),
+    Gadget('YIX', 1/2), H(0), XPhase(2, 1/4, var='phi'), CX(1, 0, as_gadget=True), CZ(0, 2, as_gadget=True),
+    ZMinus(1), Gadget('ZZZZ', 1/4, as_gadget=False), Gadget('IXZY', 1, var='theta', as_gadget=False)]
+
+
+def composed_graph(circuit: GadgetCircuit, as_gadgets=None, stack=False) -> GadgetGraph:
+    graph = GadgetGraph(num_qubits=circuit.num_qubits)
+    for gate in deepcopy(circuit.gates):
+        gate.as_gadget = gate.as_gadget if as_gadgets is None else as_gadgets
+        graph.compose(gate.graph, stack=stack)
+    return graph
+
+
+def graph_data(graph: GadgetGraph):
+    return (
+        graph.rows(), graph.qubits(), graph.types(), graph.phases(), list(graph.edges()),
+        {vertex: graph.vdata(vertex, 'var', None) for vertex in graph.vertices()}, graph.tikz())
+
+
+@pytest.mark.parametrize('as_gadgets', [None, False])
+@pytest.mark.parametrize('circuit', [GadgetCircuit(gates), *operators])
+def test_builder_matches_compose(circuit, as_gadgets):
+    assert graph_data(circuit.graph(as_gadgets=as_gadgets)) == graph_data(composed_graph(circuit, as_gadgets=as_gadgets))
+
+
+def width(graph: GadgetGraph):
+    return graph.right_row - graph.left_row
+
+
+def positions(graph: GadgetGraph) -> list:
+    return [(graph.row(vertex), graph.qubit(vertex)) for vertex in graph.vertices()]
+
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('as_gadgets', [None, True, False])
+@pytest.mark.parametrize('circuit', [GadgetCircuit(gates), *operators])
+def test_builder_stack(circuit, as_gadgets, compact):
+    graph = circuit.graph(as_gadgets=as_gadgets, stack=True, compact=compact)
+    assert len(set(positions(graph))) == graph.num_vertices()
+    assert width(graph) <= width(circuit.graph(as_gadgets=as_gadgets))
+    assert graph.num_vertices() == circuit.graph(as_gadgets=as_gadgets).num_vertices()
+
+
+def test_builder_skyline():
+    graph = GadgetCircuit([CX(0, 2), ZPhase(1, 1/2), ZPhase(3, 1/2)]).graph(stack=True)
+    control, target, phase1, phase2 = range(8, 12)
+    assert graph.row(phase1) == graph.row(control) + 1
+    assert graph.row(phase2) == graph.row(control)
+
+    graph = GadgetCircuit([Gadget('ZZ', 1/2), Gadget('IIZZ', 1/2)]).graph(stack=True)
+    assert width(graph) == 1
+
+    graph = GadgetCircuit([Gadget('IIZZ', 1/2), Gadget('ZZ', 1/2)]).graph(as_gadgets=False, stack=True)
+    assert width(graph) == 2.5
+
+
+def test_builder_compact():
+    circuit = GadgetCircuit([Gadget('ZZII', 1/2), Gadget('IZZI', 1/2), Gadget('IIZZ', 1/2)])
+    assert width(circuit.graph(as_gadgets=False, stack=True)) == 8
+    assert width(circuit.graph(as_gadgets=False, compact=True)) == 5.5
+
+    circuit = GadgetCircuit([Gadget('ZZII', 1/2, var='a'), Gadget('IXII', 1/2, var='b'), Gadget('IIZZ', 1/2, var='c')])
+    graph = circuit.graph(as_gadgets=False, compact=True)
+    rows = {graph.vdata(vertex, 'var', None): graph.row(vertex) for vertex in graph.vertices()}
+    assert rows[r'\a'] < rows[r'\b']
+    assert rows[r'\c'] < rows[r'\b']
+
+
+def test_builder_keeps_gates():
+    circuit = GadgetCircuit(gates)
+    circuit.graph(as_gadgets=False)
+    assert [gate.as_gadget for gate in circuit.gates] == [gate.as_gadget for gate in gates]
+
+
+def test_builder_template_cache():
+    gate_template.cache_clear()
+    circuit = GadgetCircuit([
+        Gadget('XYZ', 1/4), Gadget('IXYZ', 1/2), Gadget('IIXYZ', 3/2, var='theta'), CX(0, 2), CX(2, 4), CX(4, 2)])
+    graph = circuit.graph()
+    assert gate_template.cache_info().misses == 3
+    assert gate_template.cache_info().hits == 3
+    assert graph_data(graph) == graph_data(composed_graph(circuit))
+
+
+def test_template_key():
+    assert template_key(Gadget('IIXYZ', 1/2), True) == ((GateType.GADGET, 0b011, 0b110, True), 2)
+    assert template_key(CZ(3, 1), False) == ((CZ, 0, 2, False), 1)
+    assert template_key(H(2), True) == ((H, False), 2)
+    assert template_key(ZPhase(2, 1/2), True) == ((ZPhase, True), 2)
@@ -0,0 +1,91 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from zxfermion import Gadget
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.exceptions import LatexException
+from zxfermion.graphs.latex import compile_pdfs, compile_pictures, export_pdfs
+from zxfermion.utils import settings
+from .fixtures import latex_engine
+
+
+def compiled(engine: Path) -> list[str]:
+    log = Path(f'{engine}.log')
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_compile_pdfs_cached(latex_engine, tmp_path):
+    for name, content in [('a', 'first'), ('b', 'second'), ('c', 'first')]:
+        Path(f'{name}.tex').write_text(content)
+    outputs = compile_pdfs(['a.tex', 'b.tex', 'c.tex'], engine=str(latex_engine), cache=tmp_path / 'cache')
+    assert outputs == [Path('a.pdf'), Path('b.pdf'), Path('c.pdf')]
+    assert [path.read_text() for path in outputs] == ['first', 'second', 'first']
+    assert sorted(compiled(latex_engine)) == ['a.tex', 'b.tex']
+    compile_pdfs(['c.tex'], outputs=['pdfs/c.pdf'], engine=str(latex_engine), cache=tmp_path / 'cache')
+    assert Path('pdfs/c.pdf').read_text() == 'first'
+    assert len(compiled(latex_engine)) == 2
+
+
+def test_compile_pdfs_uncached(latex_engine, tmp_path):
+    Path('a.tex').write_text('first')
+    compile_pdfs(['a.tex'], engine=str(latex_engine))
+    compile_pdfs(['a.tex'], engine=str(latex_engine), cache=False)
+    assert compiled(latex_engine) == ['a.tex', 'a.tex']
+
+
+def test_compile_pdfs_settings_cache(latex_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'cache_directory', tmp_path / 'cache')
+    monkeypatch.setattr(settings, 'cache_max_bytes', 6)
+    for name, content in [('a', 'first'), ('b', 'second')]:
+        Path(f'{name}.tex').write_text(content)
+    compile_pdfs(['a.tex', 'b.tex'], engine=str(latex_engine))
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    compile_pdfs(['a.tex'], engine=str(latex_engine), cache=False)
+    assert compiled(latex_engine)[2:] == ['a.tex']
+
+
+def test_compile_pdfs_errors(latex_engine, tmp_path):
+    Path('a.tex').write_text('FAIL')
+    with pytest.raises(LatexException):
+        compile_pdfs(['a.tex'], engine=str(latex_engine), cache=tmp_path / 'cache')
+    with pytest.raises(LatexException):
+        compile_pdfs(['a.tex'], engine=str(tmp_path / 'missing'), cache=tmp_path / 'cache')
+    assert not Path('a.pdf').exists()
+
+
+def test_compile_pdfs_cleans_up(latex_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'scratch'))
+    (tmp_path / 'scratch').mkdir()
+    for name, content in [('a', 'first'), ('b', 'FAIL'), ('c', 'third')]:
+        Path(f'{name}.tex').write_text(content)
+    with pytest.raises(LatexException):
+        compile_pdfs(['a.tex', 'b.tex', 'c.tex'], engine=str(latex_engine), cache=tmp_path / 'cache')
+    with pytest.raises(LatexException):
+        compile_pdfs(['b.tex', 'c.tex'], engine=str(latex_engine), cache=None)
+    assert not list((tmp_path / 'scratch').iterdir())
+    assert not list((tmp_path / 'cache').iterdir())
+    compile_pdfs(['a.tex', 'c.tex'], engine=str(latex_engine), cache=tmp_path / 'cache')
+    assert not list((tmp_path / 'scratch').iterdir())
+    assert sorted(path.suffix for path in (tmp_path / 'cache').iterdir()) == ['.pdf', '.pdf']
+
+
+def test_compile_pictures(latex_engine, tmp_path):
+    graphs = {name: GadgetCircuit([Gadget(paulis, 1/4)]).graph() for name, paulis in [('x', 'XX'), ('z', 'ZZ')]}
+    outputs = export_pdfs(graphs, engine=str(latex_engine), cache=tmp_path / 'cache')
+    assert outputs == [Path('output/x.pdf'), Path('output/z.pdf')]
+    GadgetCircuit([Gadget('XX', 1/4)]).pdf(name='x_graph', engine=str(latex_engine))
+    assert Path('output/x_graph.pdf').read_text() == Path('output/x.pdf').read_text()
+    assert len(compiled(latex_engine)) == 3
+
+
+def test_compile_pictures_batched(latex_engine, tmp_path):
+    pytest.importorskip('pypdf')
+    circuits = {paulis: GadgetCircuit([Gadget(paulis, 1/4)]) for paulis in ['XX', 'YY', 'ZZ', 'XZ', 'ZX']}
+    pictures = {name: circuit.tikz() for name, circuit in circuits.items()}
+    outputs = compile_pictures(pictures, engine=str(latex_engine), batch_size=2, cache=tmp_path / 'cache')
+    assert all(path.exists() for path in outputs)
+    assert len(compiled(latex_engine)) == 3
+    compile_pictures(pictures, engine=str(latex_engine), batch_size=2, cache=tmp_path / 'cache')
+    assert len(compiled(latex_engine)) == 3
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from zxfermion import Gadget, LayoutGraph
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.gates.gates import XPlus, ZMinus, H, CX, CZ
+from zxfermion.gates import XPhase, ZPhase
+from zxfermion.other.operators import operators
+
+gates = [
+    Gadget('XYZ', 1/4, var='theta'), CX(0, 2), ZPhase(1, 1/2), Gadget('IZIZ', 3/2), CZ(3, 1), XPlus(3),
+    Gadget('YIX', 1/2), H(0), XPhase(2, 1/4, var='phi'), CX(1, 0, as_gadget=True), CZ(0, 2, as_gadget=True),
+    ZMinus(1), Gadget('ZZZZ', 1/4, as_gadget=False), Gadget('IXZY', 1, var='theta', as_gadget=False)]
+
+
+@pytest.mark.parametrize('stack', [False, True])
+@pytest.mark.parametrize('as_gadgets', [None, False])
+@pytest.mark.parametrize('circuit', [GadgetCircuit(gates), *operators])
+def test_layout_graph_matches_graph(circuit, as_gadgets, stack):
+    graph = circuit.graph(as_gadgets=as_gadgets, stack=stack)
+    layout = circuit.layout_graph(as_gadgets=as_gadgets, stack=stack)
+    assert layout.num_vertices() == graph.num_vertices()
+    assert layout.num_edges() == graph.num_edges()
+    assert layout.tikz() == graph.tikz()
+    assert layout.to_graph() == graph
+
+
+def test_layout_graph_round_trip():
+    graph = GadgetCircuit(gates).graph()
+    graph.remove_vertex(graph.add_vertex(0))
+    layout = LayoutGraph.from_graph(graph)
+    assert layout.variables == {
+        position: graph.vdata(vertex, 'var') for position, vertex in enumerate(graph.vertices())
+        if graph.vdata(vertex, 'var', None) is not None}
+    assert layout.tikz() == graph.tikz()
+
+    copy = layout.to_graph()
+    assert copy == graph
+    assert list(copy.vertices()) == list(graph.vertices())
+    assert list(copy.edges()) == list(graph.edges())
+    assert [copy.right_end(qubit) for qubit in range(4)] == [graph.right_end(qubit) for qubit in range(4)]
+
+
+def test_layout_graph_arrays():
+    layout = GadgetCircuit([Gadget('XYZ', 1/4), CZ(0, 1)]).layout_graph()
+    assert layout.types.dtype == np.uint8 and layout.edges.dtype == np.int64
+    assert layout.rows.dtype == layout.qubits.dtype == np.float64
+    assert 0.5 in layout.qubits.tolist()  # hadamard of the CZ sits between its qubits
+    assert 1/4 in [layout.phase(position) for position in range(layout.num_vertices())]
+    assert layout.nbytes < 60 * layout.num_vertices() + 20 * layout.num_edges()
@@ -0,0 +1,47 @@
+import io
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from zxfermion import Gadget
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.gates.gates import CX, H
+from zxfermion.gates import ZPhase
+from zxfermion.graphs.svg import phase_text, symbol, to_svg, write_svg
+from zxfermion.utils import settings
+
+SVG = '{http://www.w3.org/2000/svg}'
+gates = [Gadget('XYZ', 1/4, var=r'\theta'), CX(0, 1), H(2), ZPhase(1, 1/2), Gadget('ZZI', 3/2, as_gadget=False)]
+
+
+@pytest.mark.parametrize('stack', [False, True])
+def test_svg_elements(stack):
+    graph = GadgetCircuit(gates).graph(stack=stack)
+    root = ElementTree.fromstring(graph.svg())
+    shapes = root.findall(f'{SVG}circle') + root.findall(f'{SVG}rect')
+    boundary_hadamards = sum(
+        1 for source, target in graph.edges() if graph.edge_type((source, target)) == 2
+        and (source in graph.boundary_set or target in graph.boundary_set))
+    assert len(shapes) == graph.num_vertices() + boundary_hadamards
+    assert len(root.findall(f'{SVG}line')) == graph.num_edges()
+    assert float(root.get('width')) == (graph.output_row - graph.input_row + 1) * settings.svg_scale
+    assert sorted(text.text for text in root.findall(f'{SVG}text')) == ['+', '+', 'θ/4', '−', '−']
+
+
+def test_svg_streamed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    circuit = GadgetCircuit(gates)
+    buffer = io.StringIO()
+    write_svg(circuit.graph(), buffer, scale=20)
+    assert buffer.getvalue() == to_svg(circuit.graph(), scale=20) == circuit.layout_graph().svg(scale=20)
+    circuit.svg(name='circuit')
+    assert (tmp_path / 'output' / 'circuit.svg').read_text() == circuit.svg()
+
+
+def test_svg_phase_text():
+    assert symbol(r'\pi') == 'π'
+    assert symbol(r'\Theta') == 'Θ'
+    assert symbol('t') == 't'
+    assert phase_text(1, 2, r'\pi') == '+'
+    assert phase_text(3, 4, r'\alpha') == '3α/4'
+    assert phase_text(1, 1, '<x>') == '&lt;x&gt;'
@@ -0,0 +1,66 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from zxfermion import Gadget, GadgetCircuit, PauliTable
+from zxfermion.gates.gates import CX, CZ, H, XPlus, ZMinus
+from zxfermion.other.operators import operators
+from zxfermion.tableaus.tableau import Tableau
+
+
+def test_pauli_table():
+    gadgets = [Gadget('XYZ', 1/2), Gadget('IZIX', 3/2, var='theta', as_gadget=False), Gadget('ZZ', stack=True)]
+    table = PauliTable.from_gadgets(gadgets)
+    assert len(table) == 3
+    assert table.num_qubits == 4
+    assert table.num_words == 1
+    assert table.weights.tolist() == [3, 2, 2]
+    assert table.support.tolist() == [
+        [True, True, True, False],
+        [False, True, False, True],
+        [True, True, False, False]]
+    assert table.to_gadgets() == gadgets
+    assert [gadget.var for gadget in table.to_gadgets()] == [None, r'\theta', None]
+    assert [gadget.as_gadget for gadget in table.to_gadgets()] == [True, False, True]
+    assert [gadget.stack for gadget in table.to_gadgets()] == [False, False, True]
+
+
+def test_pauli_table_wide():
+    gadgets = [Gadget('I' * 70 + 'X'), Gadget('Z' * 130)]
+    table = PauliTable.from_gadgets(gadgets)
+    assert table.num_qubits == 130
+    assert table.num_words == 3
+    assert table.weights.tolist() == [1, 130]
+    assert table.to_gadgets() == gadgets
+
+
+@pytest.mark.parametrize('circuit', operators)
+def test_pauli_table_circuit_round_trip(circuit):
+    table = circuit.to_table()
+    assert table.num_qubits == circuit.num_qubits
+    assert GadgetCircuit.from_table(table).gates == circuit.gates
+
+
+def test_pauli_table_commutation():
+    gadgets = [Gadget('XYZ'), Gadget('ZYX'), Gadget('XII'), Gadget('ZZZ')]
+    table = PauliTable.from_gadgets(gadgets)
+    expected = np.array([[a.commutes(b) for b in gadgets] for a in gadgets])
+    assert np.array_equal(table.commutation_matrix(), expected)
+    assert table.commutes_with(Gadget('ZII')).tolist() == [False, True, False, True]
+
+
+@pytest.mark.parametrize('gate', [CX(0, 2), CX(3, 1), CZ(1, 2), H(0), XPlus(3), ZMinus(1)])
+def test_pauli_table_conjugate(gate):
+    gadgets = [Gadget(pauli_string, 1/4) for pauli_string in ['XYZX', 'YYII', 'IZXY', 'ZIZI', 'XXXX', 'IYIY']]
+    table = PauliTable.from_gadgets(gadgets).conjugate(Tableau(gate))
+    tableau = Tableau(gate)
+    assert table.to_gadgets() == [tableau(gadget) for gadget in gadgets]
+
+
+def test_pauli_table_conjugate_symplectic():
+    tableau = Tableau.from_gates([CX(0, 2), H(1), XPlus(3), CZ(2, 4), ZMinus(5), CX(5, 0), H(4), CX(1, 3)])
+    assert tableau.lookup is None
+    gadgets = [Gadget(''.join(pauli_string), 1/4) for pauli_string in itertools.product('IXYZ', repeat=6)][1:]
+    table = PauliTable.from_gadgets(gadgets).conjugate(tableau)
+    assert table.to_gadgets() == [tableau.conjugate_stim(gadget) for gadget in gadgets]
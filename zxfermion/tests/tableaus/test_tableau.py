@@ -1,5 +1,10 @@
+import itertools
+
+import pytest
+import stim
+
 from zxfermion import Gadget
-from zxfermion.gates.gates import CX
+from zxfermion.gates.gates import CX, CZ, H, X, Z, XPlus, ZPlus, XMinus, ZMinus
 from zxfermion.tableaus.tableau import Tableau
 
 # assert correct phases are being applied!
@@ -12,3 +17,30 @@ def test_tableau_cx():
     # assert tableau(Gadget('XY')) == Gadget('YZ')
     # assert tableau(Gadget('XZ')) == Gadget('YY')
     # assert tableau(Gadget('XI')) == Gadget('XX')
+
+
+def test_tableau_preserves_gadget_options():
+    gadget = Tableau(CX())(Gadget('XI', 1/2, var='theta', as_gadget=False))
+    assert gadget == Gadget('XX', 1/2)
+    assert gadget.var == r'\theta'
+    assert gadget.as_gadget is False
+
+
+@pytest.mark.parametrize('gate', [X(1), Z(0), H(2), XPlus(1), ZPlus(0), XMinus(2), ZMinus(1), CX(0, 2), CX(2, 1), CZ(1, 2)])
+def test_tableau_lookup_matches_stim(gate):
+    tableau = Tableau(gate)
+    for pauli_string in map(''.join, itertools.product('IXYZ', repeat=3)):
+        if pauli_string != 'III':
+            gadget = Gadget(pauli_string, 1/4)
+            assert tableau(gadget) == tableau.conjugate_stim(gadget)
+
+
+def test_tableau_from_stim():
+    tableau = Tableau(stim.Tableau.from_named_gate('CNOT'), qubits=[2, 0])
+    assert tableau(Gadget('IIX')) == Tableau(CX(2, 0))(Gadget('IIX'))
+    assert tableau(Gadget('ZIZ', 1/2)) == Gadget('Z', 1/2)
+    random = Tableau(stim.Tableau.random(6))
+    assert random.lookup is None
+    assert Tableau(stim.Tableau.random(4)).lookup is not None
+    assert Tableau(stim.Tableau.random(4), lookup=False).lookup is None
+    assert random(Gadget('XYZXYZ')) == random.conjugate_stim(Gadget('XYZXYZ'))
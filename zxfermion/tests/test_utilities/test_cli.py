@@ -0,0 +1,70 @@
+import io
+import json
+
+from zxfermion import Gadget
+from zxfermion.circuits.circuits import GadgetCircuit
+from zxfermion.cli import export, main, read_circuits
+from zxfermion.gates.gates import CX
+
+circuits = [GadgetCircuit([Gadget('XZY', 1/4), CX(0, 2)]), GadgetCircuit([Gadget('ZZ', 3/2)])]
+
+
+def write_jsonl(path, payloads):
+    path.write_text(''.join(json.dumps(payload) + '\n' for payload in payloads))
+
+
+def manifest(output):
+    return [json.loads(line) for line in (output / 'manifest.jsonl').read_text().splitlines()]
+
+
+def test_cli_export(tmp_path):
+    payloads = [circuit.to_dict() for circuit in circuits] + [{'name': 'broken', 'gates': [{'Swap': {}}]}]
+    write_jsonl(tmp_path / 'circuits.jsonl', payloads)
+    output = tmp_path / 'figures'
+    assert main([str(tmp_path / 'circuits.jsonl'), '--output', str(output), '--processes', '2']) == 1
+    assert (output / 'circuits_0000.tikz').read_text() == circuits[0].tikz()
+    assert (output / 'circuits_0001.tikz').read_text() == circuits[1].tikz()
+    records = {record['name']: record for record in manifest(output)}
+    assert records['circuits_0000']['status'] == records['circuits_0001']['status'] == 'ok'
+    assert records['broken']['status'] == 'failed' and 'AssertionError' in records['broken']['error']
+    assert all(record['seconds'] >= 0 for record in records.values())
+
+
+def test_cli_resume(tmp_path):
+    write_jsonl(tmp_path / 'circuits.jsonl', [circuit.to_dict() for circuit in circuits])
+    output, log = tmp_path / 'figures', io.StringIO()
+    export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', processes=1, log=log)
+    assert log.getvalue().splitlines()[-1] == '2 rendered, 0 failed, 0 skipped'
+    (output / 'circuits_0001.svg').unlink()
+    write_jsonl(tmp_path / 'circuits.jsonl', [GadgetCircuit([Gadget('XX', 1/2)]).to_dict(), circuits[1].to_dict()])
+    records = export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', processes=1, log=log)
+    assert log.getvalue().splitlines()[-1] == '2 rendered, 0 failed, 0 skipped'
+    records = export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', processes=1, log=log)
+    assert records == [] and log.getvalue().splitlines()[-1] == '0 rendered, 0 failed, 2 skipped'
+    assert len(export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='tikz', processes=1, log=log)) == 2
+    assert len(manifest(output)) == 6
+    assert len(export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', scale=20, processes=1, log=log)) == 2
+    assert len(export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', stack=True, processes=1, log=log)) == 2
+    assert len(export(read_circuits(tmp_path / 'circuits.jsonl'), output, format='svg', stack=True, processes=1, log=log)) == 0
+
+
+def test_cli_invalid_lines(tmp_path):
+    named = [json.dumps(dict(circuits[1].to_dict(), name=name)) for name in ['../escaped', 'a/b']]
+    lines = [json.dumps(circuits[0].to_dict()), '{"gates": [', '[1, 2]', *named]
+    (tmp_path / 'circuits.jsonl').write_text('\n'.join(lines) + '\n')
+    output, log = tmp_path / 'figures', io.StringIO()
+    records = export(read_circuits(tmp_path / 'circuits.jsonl'), output, processes=1, log=log)
+    assert log.getvalue().splitlines()[-1] == '1 rendered, 4 failed, 0 skipped'
+    errors = {record['name']: record.get('error', '') for record in records}
+    assert 'JSONDecodeError' in errors['circuits_0001'] and 'ValueError' in errors['circuits_0002']
+    assert errors['../escaped'].startswith('invalid name') and errors['a/b'].startswith('invalid name')
+    assert sorted(path.name for path in output.iterdir()) == ['circuits_0000.tikz', 'manifest.jsonl']
+    assert not (tmp_path / 'escaped.tikz').exists()
+
+
+def test_cli_directory(tmp_path):
+    source = tmp_path / 'circuits'
+    source.mkdir()
+    (source / 'first.json').write_text(json.dumps(circuits[0].to_dict()))
+    write_jsonl(source / 'more.jsonl', [dict(circuits[1].to_dict(), name='second')])
+    assert [name for name, _ in read_circuits(source)] == ['first', 'second']
@@ -7,6 +7,10 @@ class Settings(object):
     labels = True
     tikz_var = r'\pi'
     tikz_scale: float = 0.5
+    latex_engine = 'pdflatex'
+    svg_scale: float = 40
+    cache_directory = None  # opt-in cache of rendered artefacts, see zxfermion.cache
+    cache_max_bytes: int = 256 * 2 ** 20
     tikz_classes: dict[str, str] = {
         'boundary': 'black',
         'x_node': 'x_node',